@@ -0,0 +1 @@
+# Benchmarks are run as modules from the repository root, e.g. `python -m benchmarks.bench_spatial_grid`.
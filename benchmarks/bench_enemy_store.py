@@ -0,0 +1,36 @@
+# benchmarks/bench_enemy_store.py
+# Per-tick enemy movement (+ spatial grid rebuild) at 10k+ shapes: GeometricEnemy objects vs the NumPy EnemyStore.
+import argparse, random, time
+from assets import MAPS, GEOMETRIC_ENEMIES
+from game_objects import GeometricEnemy
+from spatial_grid import SpatialHashGrid
+from enemy_store import EnemyStore, StoredEnemy
+
+def build(count, store=None, map_id="map1", seed=1):
+    rng, path = random.Random(seed), MAPS[map_id]["path"]; enemy_ids = [e for e, d in GEOMETRIC_ENEMIES.items() if d["speed"] < 1.0]
+    enemies = []
+    for _ in range(count):
+        enemy = StoredEnemy(rng.choice(enemy_ids), path, store) if store else GeometricEnemy(rng.choice(enemy_ids), path)
+        enemy.distance_travelled = 0.0; enemies.append(enemy)
+    return enemies
+
+def run(count=10000, ticks=60, dt=1/60):
+    enemies, grid = build(count), SpatialHashGrid()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for enemy in enemies: enemy.update(dt)
+        grid.rebuild(enemies)
+    objects = (time.perf_counter() - start) / ticks
+    store = EnemyStore([MAPS["map1"]["path"]], capacity=count); build(count, store)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        store.step(dt); grid.rebuild_arrays(*store.active_columns())
+    arrays = (time.perf_counter() - start) / ticks
+    print(f"{count} enemies, mean of {ticks} ticks")
+    print(f"  objects  {objects*1000:8.2f} ms/tick\n  store    {arrays*1000:8.2f} ms/tick\n  speedup  {objects/arrays:.1f}x")
+    return {"objects": objects, "store": arrays}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GeometricEnemy objects vs EnemyStore movement")
+    parser.add_argument("--enemies", type=int, default=10000); parser.add_argument("--ticks", type=int, default=60)
+    args = parser.parse_args(); run(args.enemies, args.ticks)
@@ -0,0 +1,49 @@
+# benchmarks/bench_spatial_grid.py
+# Tower targeting and AoE blast queries: plain list scans vs SpatialHashGrid (50 towers x 2,000 enemies by default).
+import argparse, random, time
+import pygame
+from assets import MAPS, DOG_TOWERS, GEOMETRIC_ENEMIES
+from utilities import PLAYABLE_WIDTH, SCREEN_HEIGHT
+from game_objects import DogTower, GeometricEnemy
+from spatial_grid import SpatialHashGrid
+
+def build_scenario(tower_count, enemy_count, map_id="map1", seed=1):
+    rng = random.Random(seed); path = MAPS[map_id]["path"]
+    attackers = [t for t, d in DOG_TOWERS.items() if d["base_stats"].get("attack_speed")]
+    towers = [DogTower(rng.choice(attackers), (rng.randint(0, PLAYABLE_WIDTH), rng.randint(50, SCREEN_HEIGHT))) for _ in range(tower_count)]
+    enemies = []
+    for _ in range(enemy_count):
+        enemy = GeometricEnemy(rng.choice(list(GEOMETRIC_ENEMIES)), path); enemy.move(rng.uniform(0, 60)); enemies.append(enemy)
+    return towers, [e for e in enemies if e.is_active]
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat): start = time.perf_counter(); fn(); times.append(time.perf_counter() - start)
+    return min(times)
+
+def run(tower_count=50, enemy_count=2000, blasts=200, repeat=5):
+    towers, enemies = build_scenario(tower_count, enemy_count); grid = SpatialHashGrid()
+    blast_centers = [pygame.Vector2(e.pos) for e in random.Random(2).sample(enemies, min(blasts, len(enemies)))]
+    def target_list():
+        for tower in towers: tower.find_target(enemies)
+    def target_grid():
+        grid.rebuild(enemies)
+        for tower in towers: tower.find_target(enemies, grid)
+    def blast_list():
+        for center in blast_centers: [e for e in enemies if e.pos.distance_to(center) <= 60]
+    def blast_grid():
+        for center in blast_centers: grid.query_radius(center, 60, sort=True)
+    target_grid(); picks = [t.target for t in towers]; target_list()
+    assert picks == [t.target for t in towers], "grid and list targeting disagree"
+    results = {"find_target list": best_of(target_list, repeat), "find_target grid (incl. rebuild)": best_of(target_grid, repeat),
+               "blast list": best_of(blast_list, repeat), "blast grid": best_of(blast_grid, repeat)}
+    print(f"{len(towers)} towers x {len(enemies)} enemies, {len(blast_centers)} blasts (best of {repeat})")
+    for name, seconds in results.items(): print(f"  {name:34s} {seconds*1000:8.2f} ms")
+    print(f"  targeting speedup {results['find_target list']/results['find_target grid (incl. rebuild)']:.1f}x, blast speedup {results['blast list']/results['blast grid']:.1f}x")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List scan vs spatial grid for targeting and blasts")
+    parser.add_argument("--towers", type=int, default=50); parser.add_argument("--enemies", type=int, default=2000)
+    parser.add_argument("--blasts", type=int, default=200); parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(); run(args.towers, args.enemies, args.blasts, args.repeat)
@@ -0,0 +1,34 @@
+# benchmarks/bench_targeting.py
+# DogTower.find_target per priority: sorting the grid's in-range list vs the ProgressIndex bisect-and-scan.
+import argparse, random, time
+from spatial_grid import SpatialHashGrid
+from progress_index import ProgressIndex
+from benchmarks.bench_spatial_grid import build_scenario, best_of
+
+def sort_target(tower, grid):
+    # What find_target did before the index: full sort of the in-range list for element 0
+    in_range = [e for e in grid.query_radius(tower.pos, tower.get_stat("range")) if ("camo" not in e.properties or tower.get_stat("can_see_camo")) and e.tier - e.incoming_damage_tiers > 0]
+    if not in_range: return None
+    keys = {"first": lambda e: (-e.distance_travelled, e.uid), "last": lambda e: (e.distance_travelled, e.uid), "strong": lambda e: (-e.tier, e.uid)}
+    in_range.sort(key=keys[tower.targeting_priority]); return in_range[0]
+
+def run(tower_count=50, enemy_count=2000, repeat=5, seed=3):
+    towers, enemies = build_scenario(tower_count, enemy_count, seed=seed); grid, index = SpatialHashGrid(), ProgressIndex()
+    grid.rebuild(enemies); index.rebuild(enemies)
+    for enemy in random.Random(seed).sample(enemies, len(enemies) // 10): enemy.add_incoming_damage(enemy.tier) # Exercise the overkill filter
+    print(f"{len(towers)} towers x {len(enemies)} enemies (best of {repeat})")
+    results = {"index build": best_of(lambda: (index.rebuild(enemies), index._paths(), index._path_tiers()), repeat)}
+    for priority in ("first", "last", "strong"):
+        for tower in towers: tower.targeting_priority = priority
+        expected = [sort_target(t, grid) for t in towers]
+        for tower in towers: tower.find_target(enemies, grid, index)
+        assert expected == [t.target for t in towers], f"index disagrees with sort for '{priority}'"
+        results[f"{priority}: sort"] = best_of(lambda: [sort_target(t, grid) for t in towers], repeat)
+        results[f"{priority}: index"] = best_of(lambda: [t.find_target(enemies, grid, index) for t in towers], repeat)
+    for name, seconds in results.items(): print(f"  {name:18s} {seconds*1000:8.2f} ms")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sorted in-range list vs ProgressIndex targeting")
+    parser.add_argument("--towers", type=int, default=50); parser.add_argument("--enemies", type=int, default=2000); parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(); run(args.towers, args.enemies, args.repeat)
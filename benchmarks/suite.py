@@ -0,0 +1,112 @@
+# benchmarks/suite.py
+# Engine and renderer hot paths under synthetic stress, written as JSON and optionally checked against a stored baseline:
+#   python -m benchmarks.suite --out results.json --baseline benchmarks/baseline.json --threshold 0.25
+import argparse, json, os, platform, random, sys, tempfile, time
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1"); os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+from assets import DOG_TOWERS, GEOMETRIC_ENEMIES
+from utilities import SCREEN_WIDTH, SCREEN_HEIGHT
+from game_objects import DogTower
+from simulation import HeadlessGame, SIM_DT
+from save_writer import save_writer
+from benchmarks.bench_spatial_grid import build_scenario
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def measure(fn, setup=None, repeat=5, number=1):
+    """Best-of-`repeat` seconds per call of fn(state), with `setup()` (untimed) providing a fresh state for each repeat."""
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup() if setup else None; start = time.perf_counter()
+        for _ in range(number): fn(state)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def stress_engine(enemy_count, tower_count=30, map_id="map1", seed=7):
+    """A mid-round engine with towers placed on valid land and `enemy_count` enemies spread along the paths."""
+    rng = random.Random(seed); engine = HeadlessGame(map_id, "medium").game_engine; engine.start_new_game(map_id, "medium")
+    engine.money, engine.lives = 10**9, 10**9
+    attackers = [t for t, d in DOG_TOWERS.items() if d["base_stats"].get("attack_speed") and not d.get("is_water_only")]
+    spots = list(engine.placement_raster.valid_positions(False, step=40)); rng.shuffle(spots)
+    for pos in spots[:tower_count]: engine.place_tower(rng.choice(attackers), pos)
+    enemy_ids = [e for e, d in GEOMETRIC_ENEMIES.items() if "boss" not in d.get("properties", [])] # Bosses' gradient fills can't be drawn yet
+    for i in range(enemy_count):
+        enemy = engine.enemy_pool.acquire(rng.choice(enemy_ids), engine.path_tables[i % len(engine.path_tables)])
+        enemy.place_at(rng.uniform(0, enemy.path.total_length * 0.95)); engine.enemies.append(enemy)
+    engine.enemy_grid.rebuild(engine.enemies); engine.progress_index.rebuild(engine.enemies); engine.is_round_active = True
+    return engine
+
+def bench_engine(results, sizes, repeat):
+    for size in sizes:
+        ticks = max(3, 2000 // size)
+        results[f"engine.update x{size} enemies"] = measure(lambda e: [e.update(SIM_DT) for _ in range(ticks)], lambda: stress_engine(size), repeat) / ticks
+
+def bench_objects(results, repeat):
+    towers, enemies = build_scenario(50, 2000)
+    results["DogTower.find_target (50 towers, 2000 enemies, list)"] = measure(lambda _: [t.find_target(enemies) for t in towers], repeat=repeat)
+    results["GeometricEnemy.move (2000 enemies)"] = measure(lambda _: [e.move(SIM_DT) for e in enemies], repeat=repeat)
+    engine = stress_engine(0); rng = random.Random(5); points = [(rng.randint(0, 1150), rng.randint(0, SCREEN_HEIGHT)) for _ in range(2000)]
+    results["GameEngine.is_valid_placement (2000 points)"] = measure(lambda _: [engine.is_valid_placement("beagle_scout", p) for p in points], repeat=repeat)
+    results["GameEngine.is_valid_placement_exact (2000 points)"] = measure(lambda _: [engine.is_valid_placement_exact("beagle_scout", p) for p in points], repeat=repeat)
+
+def bench_renderer(results, repeat):
+    pygame.init(); screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    from renderer import Renderer
+    from sprite_atlas import parse_svg_path
+    from ui_manager import UIManager
+    paths = sorted({part['d'] for assets in (DOG_TOWERS, GEOMETRIC_ENEMIES) for data in assets.values()
+                    for svg in [data.get('svg_params') or data.get('svg') or {}] + list(data.get('upgrade_svgs', {}).values())
+                    for part in ([svg] if 'shape' in svg else svg.values()) if isinstance(part, dict) and part.get('shape') == 'path'})
+    results[f"parse_svg_path uncached ({len(paths)} paths)"] = measure(lambda _: [parse_svg_path.__wrapped__(d) for d in paths], repeat=repeat)
+    tower = DogTower('corgi_cannon', (400, 300)); tower.upgrades = [2, 0, 3]
+    def cold_renderer(): parse_svg_path.cache_clear(); return Renderer(pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))) # parse_svg_path is memoized process-wide
+    results["Renderer._draw_asset cold"] = measure(lambda r: r._draw_asset(tower, DOG_TOWERS, scale=1.2, pos_override=(400, 300)), cold_renderer, repeat)
+    warm = cold_renderer(); warm._draw_asset(tower, DOG_TOWERS, scale=1.2, pos_override=(400, 300))
+    results["Renderer._draw_asset warm"] = measure(lambda r: r._draw_asset(tower, DOG_TOWERS, scale=1.2, pos_override=(400, 300)), lambda: warm, repeat, number=200)
+    # draw_game_state on an offscreen surface with a busy board, through a minimal Game stand-in the UI can hang off
+    engine = stress_engine(300); offscreen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    game = type('obj', (object,), {'game_state': 'in_game', 'renderer': Renderer(offscreen), 'game_engine': engine, 'sound_manager': engine.sound_manager, 'selected_difficulty': 'medium', 'selected_map': 'map1', 'game_speed': 1.0})()
+    ui = UIManager(game); ui.selected_tower = engine.towers[0]; ui.update(engine); game.renderer.draw_game_state(engine, ui)
+    results["Renderer.draw_game_state (30 towers, 300 enemies)"] = measure(lambda _: game.renderer.draw_game_state(engine, ui), repeat=repeat, number=10)
+
+def bench_persistence(results, repeat):
+    engine = stress_engine(0, tower_count=60); engine.autosave = True; cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            # save_game only queues the write, so the full save includes waiting for the writer thread to finish it
+            results["GameEngine.save_game (60 towers)"] = measure(lambda _: (engine.save_game(), save_writer.flush()), repeat=repeat, number=5)
+            results["GameEngine.save_game queued (60 towers)"] = measure(lambda _: engine.save_game(), repeat=repeat, number=5); save_writer.flush()
+            results["GameEngine.load_game (60 towers)"] = measure(lambda _: engine.load_game(), repeat=repeat, number=5)
+        finally: os.chdir(cwd)
+
+def compare(results, baseline, threshold):
+    """Names whose time grew by more than `threshold` (a fraction) over the baseline, as (name, baseline, current)."""
+    return [(name, baseline[name], seconds) for name, seconds in results.items() if name in baseline and seconds > baseline[name] * (1 + threshold)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine and renderer benchmark suite")
+    parser.add_argument("--out", help="Write results as JSON to this file"); parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", help=f"Compare against a baseline JSON (e.g. {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Also store these results as a baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline before failing (0.25 = 25%%)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Enemy counts for the engine.update stress")
+    parser.add_argument("--skip", nargs="+", default=[], choices=["engine", "objects", "renderer", "persistence"])
+    args = parser.parse_args(argv)
+    results, groups = {}, {"engine": lambda: bench_engine(results, args.sizes, args.repeat), "objects": lambda: bench_objects(results, args.repeat),
+                           "renderer": lambda: bench_renderer(results, args.repeat), "persistence": lambda: bench_persistence(results, args.repeat)}
+    for name, run in groups.items():
+        if name not in args.skip: run()
+    for name, seconds in results.items(): print(f"  {name:55s} {seconds*1000:10.3f} ms")
+    report = {"meta": {"python": platform.python_version(), "platform": platform.platform(), "pygame": pygame.version.ver, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}, "results": results}
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, 'w') as f: json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as f: baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions: print(f"REGRESSION {name}: {before*1000:.3f} ms -> {after*1000:.3f} ms ({after/before - 1:+.0%})")
+        if regressions: return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__": sys.exit(main())
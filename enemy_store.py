@@ -0,0 +1,111 @@
+# enemy_store.py
+# Optional NumPy struct-of-arrays backing for enemies: movement along the map paths is one vectorized step per tick.
+import pygame
+from game_objects import GeometricEnemy
+from path_table import PathTable
+try:
+    import numpy as np
+except ImportError: # The store is an opt-in optimization; the engine falls back to plain GeometricEnemy objects
+    np = None
+NUMPY_AVAILABLE = np is not None
+
+class EnemyStore:
+    """Position, distance_travelled, tier, base speed and status-effect speed multiplier for every live enemy, one array per field."""
+    def __init__(self, paths, capacity=1024):
+        if not NUMPY_AVAILABLE: raise RuntimeError("EnemyStore requires NumPy")
+        self.paths, self.path_ids, self.path_tables = [p if isinstance(p, PathTable) else PathTable.for_points(p) for p in paths], {}, []
+        for path_id, path in enumerate(self.paths):
+            self.path_tables.append((np.array(path.cumulative), np.array(path.xs), np.array(path.ys))); self.path_ids[id(path)] = path_id
+        self.path_lengths = np.array([table[0][-1] for table in self.path_tables])
+        self.size, self.free_slots = 0, []
+        self._allocate_columns(capacity)
+
+    def _allocate_columns(self, capacity):
+        old_size = self.size; self.capacity = capacity
+        def grow(name, dtype, fill=0):
+            column = np.full(capacity, fill, dtype=dtype)
+            if old_size: column[:old_size] = getattr(self, name)[:old_size]
+            setattr(self, name, column)
+        grow('x', np.float64); grow('y', np.float64); grow('distance', np.float64); grow('tier', np.int64)
+        grow('speed_base', np.float64); grow('speed_mult', np.float64, 1.0); grow('path_id', np.int32); grow('alive', np.bool_, False)
+        grow('entities', object, None)
+
+    def allocate(self, enemy, path):
+        if self.free_slots: slot = self.free_slots.pop()
+        else:
+            if self.size == self.capacity: self._allocate_columns(self.capacity * 2)
+            slot = self.size; self.size += 1
+        table = path if isinstance(path, PathTable) else PathTable.for_points(path)
+        self.path_id[slot], self.alive[slot], self.entities[slot] = self.path_ids[id(table)], True, enemy
+        self.distance[slot], self.speed_mult[slot] = 0.0, 1.0
+        return slot
+
+    def release(self, slot):
+        self.alive[slot], self.entities[slot] = False, None; self.free_slots.append(slot)
+
+    def step(self, dt):
+        """Moves every live enemy along its path. Returns the enemies that reached the end (leaks)."""
+        n = self.size
+        if not n: return []
+        alive, distance = self.alive[:n], self.distance[:n]
+        path_id = self.path_id[:n]; path_length = self.path_lengths[path_id]
+        # Same rule as GeometricEnemy.move: an enemy sitting on the last point at the start of a tick has leaked
+        leaked_slots = np.flatnonzero(alive & (distance >= path_length))
+        moving = alive & (distance < path_length)
+        step = self.speed_base[:n] * self.speed_mult[:n] * 50 * dt
+        np.minimum(distance + step, path_length, out=distance, where=moving)
+        for pid, (cumulative, xs, ys) in enumerate(self.path_tables):
+            on_path = moving & (path_id == pid) if len(self.path_tables) > 1 else moving
+            if not on_path.any(): continue
+            d = distance[on_path]; self.x[:n][on_path] = np.interp(d, cumulative, xs); self.y[:n][on_path] = np.interp(d, cumulative, ys)
+        leaked = [self.entities[slot] for slot in leaked_slots]
+        for enemy in leaked: enemy.is_active = False
+        return leaked
+
+    def active_columns(self):
+        """(entities, x, y) for live slots, for bulk consumers such as SpatialHashGrid.rebuild_arrays."""
+        slots = np.flatnonzero(self.alive[:self.size])
+        return self.entities[slots], self.x[slots], self.y[slots]
+
+def _column(name, cast):
+    def fget(self):
+        slot = self._slot
+        return cast(getattr(self._store, name)[slot]) if slot >= 0 else self._detached[name]
+    def fset(self, value):
+        slot = self._slot
+        if slot >= 0: getattr(self._store, name)[slot] = value
+        else: self._detached[name] = value
+    return property(fget, fset)
+
+class StoredEnemy(GeometricEnemy):
+    """GeometricEnemy whose hot fields live in an EnemyStore. Once inactive it detaches and keeps its last values."""
+    distance_travelled, tier, speed_base, speed_multiplier = _column('distance', float), _column('tier', int), _column('speed_base', float), _column('speed_mult', float)
+    def __init__(self, enemy_id, path, store, uid=None):
+        self._store, self._detached, self._slot = store, {}, -1
+        super().__init__(enemy_id, path, uid)
+    def reset(self, enemy_id, path, store=None, uid=None):
+        if store is not None: self._store = store
+        self._detached = {}; self._slot = self._store.allocate(self, path)
+        super().reset(enemy_id, path, uid)
+    @property
+    def pos(self):
+        slot = self._slot
+        return pygame.Vector2(self._store.x[slot], self._store.y[slot]) if slot >= 0 else pygame.Vector2(self._detached['pos'])
+    @pos.setter
+    def pos(self, value):
+        if self._slot >= 0: self._store.x[self._slot], self._store.y[self._slot] = value[0], value[1]
+        else: self._detached['pos'] = pygame.Vector2(value)
+    @property
+    def rect(self): return pygame.Rect(self.pos.x-15, self.pos.y-15, 30, 30)
+    @rect.setter
+    def rect(self, value): pass # Derived from pos
+    @property
+    def is_active(self): return self._slot >= 0
+    @is_active.setter
+    def is_active(self, value):
+        if value or self._slot < 0: return
+        self._detached = {'pos': self.pos, 'distance': self.distance_travelled, 'tier': self.tier, 'speed_base': self.speed_base, 'speed_mult': self.speed_multiplier}
+        self._store.release(self._slot); self._slot = -1
+    def update(self, dt): pass # Movement is advanced in bulk by EnemyStore.step
+    def move(self, dt): pass
+    def _new_enemy(self, enemy_id, uid): return self.pool.acquire(enemy_id, self.path, self._store, uid=uid) if self.pool else StoredEnemy(enemy_id, self.path, self._store, uid)
@@ -3,91 +3,148 @@
 import math, pygame, json, os
 from assets import MAPS, ROUND_COMPOSITIONS, GEOMETRIC_ENEMIES, DOG_TOWERS
 from utilities import STARTING_MONEY, STARTING_LIVES, DIFFICULTY_SETTINGS, PATH_RESTRICTION_WIDTH, PLAYABLE_WIDTH
-from game_objects import DogTower, GeometricEnemy, Projectile, VisualEffect
+from game_objects import DogTower, GeometricEnemy, Projectile, is_upgrade_path_locked, reserve_uids
+from spatial_grid import SpatialHashGrid
+from progress_index import ProgressIndex
+from path_table import PathTable
+from placement_raster import PlacementRaster
+from enemy_store import EnemyStore, StoredEnemy, NUMPY_AVAILABLE
+from pool import ObjectPool
+from spawn_scheduler import SpawnScheduler
+from status_effects import StatusEffectTimers
+from visual_effects import EffectBuffer
+from save_writer import save_writer
+from profiler import profiler
 SAVE_FILE = "savegame.json"
+PROGRESS_INDEX_MIN_WORK = 2000 # towers x enemies; below this, scanning small in-range lists beats building the index
 
 class GameEngine:
     # --- (init, reset, start_new_game, start_next_round are unchanged) ---
-    def __init__(self, game): self.game,self.sound_manager=game,game.sound_manager; self.reset()
+    def __init__(self, game, autosave=True, use_enemy_store=False, mid_round_saves=True):
+        self.game,self.sound_manager,self.autosave=game,game.sound_manager,autosave
+        self.mid_round_saves = mid_round_saves # Saving during a round also stores enemies, projectiles and the spawn cursor
+        self.use_enemy_store = use_enemy_store and NUMPY_AVAILABLE # Array-backed enemies need NumPy; otherwise plain objects
+        self.recorder = None # Optional replay.InputRecorder; player actions, ticks and round ends are reported to it
+        self.reset()
     def reset(self):
-        self.towers, self.enemies, self.projectiles, self.visual_effects = [],[],[],[]
+        self.towers, self.enemies, self.projectiles, self.visual_effects = [],[],[],EffectBuffer()
         self.current_round, self.money, self.lives = 0, STARTING_MONEY, STARTING_LIVES
-        self.map_data, self.map_paths, self.difficulty_modifiers = None,[],{}
-        self.is_round_active, self.spawn_queue, self.round_timer, self.win, self.lose = False,[],0,False,False
-        self.auto_start_next_round = False
+        self.map_data, self.map_paths, self.path_tables, self.placement_raster, self.difficulty_modifiers = None,[],[],None,{}
+        self.is_round_active, self.spawn_scheduler, self.round_timer, self.win, self.lose = False,SpawnScheduler(),0,False,False
+        self.auto_start_next_round, self.tick = False, 0
+        self.enemy_grid, self.progress_index, self.enemy_store = SpatialHashGrid(), ProgressIndex(), None
+        self.status_timers = StatusEffectTimers()
+        self.enemy_pool, self.projectile_pool = ObjectPool(GeometricEnemy), ObjectPool(Projectile)
+        self.dead_enemies, self.retired_enemies = [], [] # Popped/leaked this tick and last tick; returned to the pool a tick late
     def start_new_game(self, map_id, difficulty):
         self.reset(); self.map_data = MAPS[map_id]
         self.map_paths = [self.map_data.get("path",[])] + [self.map_data.get(f"path{i}",[]) for i in range(2,5)]
         self.map_paths = [p for p in self.map_paths if p]
+        self.path_tables = [PathTable.for_points(p) for p in self.map_paths] # Enemies move by arc-length lookup on these
+        self.placement_raster = PlacementRaster(map_id, self.map_paths, self.map_data.get("water_areas",[]))
+        if self.use_enemy_store: self.enemy_store, self.enemy_pool = EnemyStore(self.path_tables), ObjectPool(StoredEnemy)
         self.difficulty_modifiers = DIFFICULTY_SETTINGS[difficulty]
         self.money, self.lives = self.difficulty_modifiers['starting_money'], self.difficulty_modifiers['starting_lives']
     def start_next_round(self):
+        if self.recorder: self.recorder.action(self, "start_next_round")
+        self._start_next_round()
+    def _start_next_round(self):
         if self.is_round_active or self.win or self.lose: return
         self.is_round_active, self.current_round, self.round_timer = True, self.current_round + 1, 0
         if self.current_round > len(ROUND_COMPOSITIONS): self.win, self.is_round_active = True, False; self.delete_save(); return
-        self.spawn_queue = []
-        for enemy_id, count, start_time, end_time in ROUND_COMPOSITIONS[self.current_round - 1]:
-            spacing = (end_time-start_time)/count if count>1 else 0
-            for i in range(count): self.spawn_queue.append((start_time+i*spacing, enemy_id, self.map_paths[i % len(self.map_paths)]))
-        self.spawn_queue.sort(key=lambda x: x[0], reverse=True)
+        self.spawn_scheduler = SpawnScheduler(ROUND_COMPOSITIONS[self.current_round - 1], self.path_tables)
 
     def update(self, dt):
+        self.tick += 1; self._update(dt)
+        if self.recorder: self.recorder.on_tick(self, dt)
+
+    def _update(self, dt):
         if self.lose or self.win: return
-        if self.is_round_active:
-            self.round_timer += dt
-            while self.spawn_queue and self.round_timer >= self.spawn_queue[-1][0]:
-                _, enemy_id, path = self.spawn_queue.pop()
-                new_enemy = GeometricEnemy(enemy_id, path); new_enemy.speed_base *= self.difficulty_modifiers['enemy_speed_modifier']
-                self.enemies.append(new_enemy)
-        for tower in self.towers:
-            tower.update(dt, self.enemies)
-            if tower.can_attack():
-                new_projectiles, new_effects = tower.attack(self.enemies, self.sound_manager); self.projectiles.extend(new_projectiles); self.visual_effects.extend(new_effects)
-        for enemy in self.enemies[:]:
-            enemy.update(dt)
-            if not enemy.is_active:
-                if enemy in self.enemies: self.enemies.remove(enemy)
-                self.lives -= enemy.get_tier()
-                if self.lives <= 0: self.lives = 0; self.lose = True; self.delete_save()
-        
-        projectiles_to_remove = []
-        for proj in self.projectiles:
-            proj.update(dt)
-            if not proj.is_active: projectiles_to_remove.append(proj); continue
+        with profiler.section("engine.spawn"):
+            if self.is_round_active:
+                self.round_timer += dt
+                for enemy_id, path in self.spawn_scheduler.pop_due(self.round_timer):
+                    new_enemy = self._acquire_enemy(enemy_id, path); new_enemy.speed_base *= self.difficulty_modifiers['enemy_speed_modifier']
+                    self.enemies.append(new_enemy); self.enemy_grid.insert(new_enemy); self.progress_index.insert(new_enemy)
+        with profiler.section("engine.towers"):
+            progress_index = self.progress_index if len(self.towers) * len(self.enemies) >= PROGRESS_INDEX_MIN_WORK else None
+            for tower in self.towers:
+                tower.update(dt, self.enemies, self.enemy_grid, progress_index)
+                if tower.can_attack():
+                    self.projectiles.extend(tower.attack(self))
+        with profiler.section("engine.enemies"):
+            self.status_timers.advance(dt)
+            if self.enemy_store:
+                leaked = self.enemy_store.step(dt)
+                if leaked: self.enemies = [e for e in self.enemies if e.is_active]; self.dead_enemies.extend(leaked)
+                for enemy in leaked: self.lives -= enemy.get_tier() * enemy.stack_count
+                if leaked and self.lives <= 0: self.lives = 0; self.lose = True; self.delete_save()
+                self.enemy_grid.rebuild_arrays(*self.enemy_store.active_columns())
+            else:
+                for enemy in self.enemies[:]:
+                    enemy.update(dt)
+                    if not enemy.is_active:
+                        if enemy in self.enemies: self.enemies.remove(enemy); self.dead_enemies.append(enemy)
+                        self.lives -= enemy.get_tier() * enemy.stack_count
+                        if self.lives <= 0: self.lives = 0; self.lose = True; self.delete_save()
+                self.enemy_grid.rebuild(self.enemies)
+            self.progress_index.rebuild(self.enemies)
+        with profiler.section("engine.projectiles"):
+            projectiles_to_remove = []
+            for proj in self.projectiles:
+                proj.update(dt)
+                if not proj.is_active: projectiles_to_remove.append(proj); continue
             
-            hit_something = False
-            if proj.target and proj.target.is_active and proj.check_collision():
-                hit_something = True
+                hit_something = False
+                if proj.target and proj.target.is_active and proj.check_collision():
+                    hit_something = True
                 
-                if proj.is_area_of_effect:
-                    # --- BUG FIX: Use named arguments for VisualEffect ---
-                    self.visual_effects.append(VisualEffect(type="explosion", pos=proj.pos, radius=proj.blast_radius, lifetime=0.2))
-                    for enemy in self.enemies[:]:
-                        if enemy.pos.distance_to(proj.pos) <= proj.blast_radius:
-                            newly_spawned = enemy.take_damage(proj.damage_tier, proj.owner, self.sound_manager)
-                            self.money += enemy.money_on_hit
-                            if not enemy.is_active and enemy in self.enemies: self.enemies.remove(enemy)
-                            self.enemies.extend(newly_spawned)
-                else:
-                    newly_spawned = proj.target.take_damage(proj.damage_tier, proj.owner, self.sound_manager)
-                    self.money += proj.target.money_on_hit
-                    if not proj.target.is_active and proj.target in self.enemies: self.enemies.remove(proj.target)
-                    self.enemies.extend(newly_spawned)
+                    if proj.is_area_of_effect:
+                        self.visual_effects.add_explosion(proj.pos, proj.blast_radius, lifetime=0.2)
+                        for enemy in self.enemy_grid.query_radius(proj.pos, proj.blast_radius, sort=True): self.damage_enemy(enemy, proj.damage_tier, proj.owner)
+                    else: self.damage_enemy(proj.target, proj.damage_tier, proj.owner)
 
-            if hit_something: proj.cleanup(); projectiles_to_remove.append(proj)
+                if hit_something: proj.cleanup(); projectiles_to_remove.append(proj)
 
-        for proj in projectiles_to_remove:
-            if proj in self.projectiles: self.projectiles.remove(proj)
-        self.visual_effects = [effect for effect in self.visual_effects if effect.update(dt)]
-        if self.is_round_active and not self.enemies and not self.spawn_queue:
+            if projectiles_to_remove:
+                removed = set(projectiles_to_remove); self.projectiles = [p for p in self.projectiles if p not in removed]; self.projectile_pool.release_all(projectiles_to_remove)
+        with profiler.section("engine.effects"): self.visual_effects.advance(dt)
+        # An enemy that died this tick may still be a projectile's target until the next projectile pass has dropped it
+        self.enemy_pool.release_all(self.retired_enemies); self.retired_enemies, self.dead_enemies = self.dead_enemies, []
+        if self.is_round_active and not self.enemies and not self.spawn_scheduler:
             self.is_round_active = False; self.money += 100 + self.current_round; self.save_game()
-            if self.auto_start_next_round: self.start_next_round()
+            if self.recorder: self.recorder.on_round_end(self)
+            if self.auto_start_next_round: self._start_next_round()
+
+    def damage_enemy(self, enemy, damage, owner_tower, award_money=True):
+        # Single place where hits resolve, so pop children and tier drops reach the spatial grid and progress index mid-tick
+        tier_before = enemy.tier; newly_spawned = enemy.take_damage(damage, owner_tower, self.sound_manager, self.status_timers)
+        if award_money: self.money += enemy.money_on_hit * enemy.stack_count
+        if not enemy.is_active and enemy in self.enemies: self.enemies.remove(enemy); self.dead_enemies.append(enemy)
+        elif enemy.is_active and enemy.tier != tier_before: self.progress_index.retier(enemy)
+        self.enemies.extend(newly_spawned); self.enemy_grid.insert_many(newly_spawned); self.progress_index.insert_many(newly_spawned)
+        return newly_spawned
+
+    def _acquire_enemy(self, enemy_id, path, uid=None):
+        return self.enemy_pool.acquire(enemy_id, path, self.enemy_store, uid=uid) if self.enemy_store else self.enemy_pool.acquire(enemy_id, path, uid=uid)
+
+    def split_stack(self, stack):
+        """A tower is about to hit one member of a stack: that member becomes its own enemy, visible to the rest of the tick."""
+        member = stack.split_off(); self.status_timers.track(member); self.enemies.append(member); self.enemy_grid.insert(member); self.progress_index.insert(member)
+        return member
+
+    def enemy_count(self): return sum(enemy.stack_count for enemy in self.enemies)
 
     # --- (The rest of the file is unchanged) ---
     def is_valid_placement(self, tower_id, pos):
+        if pos[0] > PLAYABLE_WIDTH: return False
+        if self.placement_raster and self.placement_raster.covers(pos): return self.placement_raster.is_valid(DOG_TOWERS[tower_id].get("is_water_only", False), pos)
+        return self.is_valid_placement_exact(tower_id, pos)
+    def is_valid_placement_exact(self, tower_id, pos):
+        # Geometry test for positions the raster doesn't cover (off-screen or sub-pixel); also the raster's reference
         if pos[0] > PLAYABLE_WIDTH: return False
         tower_data = DOG_TOWERS[tower_id]
-        in_water = any(pygame.Rect(a['x'],a['y'],a['width'],a['height']).collidepoint(pos) for a in self.map_data.get("water_areas",[]))
+        in_water = any(pygame.Rect(a['x'],a['y'],a['width'],a['height']).collidepoint(pos) if a['shape'] == 'rect' else pygame.Vector2(a['cx'],a['cy']).distance_to(pos) <= a['r'] for a in self.map_data.get("water_areas",[]))
         if tower_data.get("is_water_only", False) and not in_water: return False
         if not tower_data.get("is_water_only", False) and in_water: return False
         for path in self.map_paths:
@@ -100,36 +157,88 @@ class GameEngine:
                 if closest_point.distance_to(pygame.Vector2(pos)) < PATH_RESTRICTION_WIDTH: return False
         if any(pygame.Vector2(t.x, t.y).distance_to(pygame.Vector2(pos)) < 40 for t in self.towers): return False
         return True
+    def pool_stats(self): return {"enemies": self.enemy_pool.stats(), "projectiles": self.projectile_pool.stats()}
+    def get_tower_cost(self, tower_id): return int(DOG_TOWERS[tower_id]['cost'] * self.difficulty_modifiers['tower_cost_modifier'])
     def place_tower(self, tower_id, position):
-        cost = int(DOG_TOWERS[tower_id]['cost'] * self.difficulty_modifiers['tower_cost_modifier'])
+        if self.recorder: self.recorder.action(self, "place_tower", tower_id, list(position))
+        cost = self.get_tower_cost(tower_id)
         if self.money >= cost and self.is_valid_placement(tower_id, position):
-            self.money-=cost; self.towers.append(DogTower(tower_id, position)); self.sound_manager.play_sound('place_tower'); return True
+            self.money-=cost; self.towers.append(DogTower(tower_id, position)); self.placement_raster.add_tower(position); self.sound_manager.play_sound('place_tower'); return True
         return False
     def upgrade_tower(self, tower, path_index):
+        if self.recorder and tower in self.towers: self.recorder.action(self, "upgrade_tower", self.towers.index(tower), path_index)
         if not tower or path_index < 0 or path_index > 2: return
         current_tier = tower.upgrades[path_index]
         if current_tier >= 5: return
-        upgrades = tower.upgrades
-        if upgrades[path_index] >= 2 and any(p > 2 for i, p in enumerate(upgrades) if i != path_index): return
-        if any(p > 2 for p in upgrades) and upgrades[path_index] < 2: return
-        if upgrades[path_index] >= 2 and upgrades.count(2) > 0 and (upgrades.index(2) if 2 in upgrades else -1) != path_index: return
+        if is_upgrade_path_locked(tower.upgrades, path_index): return
         upgrade_data = DOG_TOWERS[tower.tower_id]['upgrades'][f'path{path_index+1}'][current_tier]
         cost = upgrade_data['cost']
         if self.money >= cost:
-            self.money -= cost; tower.apply_upgrade(path_index, upgrade_data); tower.upgrades[path_index] += 1
-            tower.total_cost += cost; self.sound_manager.play_sound('click')
+            self.money -= cost; tower.apply_upgrade(path_index); self.sound_manager.play_sound('click')
     def sell_tower(self, tower):
-        if tower in self.towers: self.money += tower.get_sell_value(); self.towers.remove(tower); self.sound_manager.play_sound('sell')
+        if self.recorder and tower in self.towers: self.recorder.action(self, "sell_tower", self.towers.index(tower))
+        if tower in self.towers: self.money += tower.get_sell_value(); self.towers.remove(tower); self.placement_raster.remove_tower((tower.x, tower.y)); self.sound_manager.play_sound('sell')
+    def set_targeting(self, tower, priority):
+        if self.recorder and tower in self.towers: self.recorder.action(self, "set_targeting", self.towers.index(tower), priority)
+        tower.targeting_priority = priority
+    def cycle_targeting(self, tower): self.set_targeting(tower, tower.targeting_priorities[(tower.targeting_priorities.index(tower.targeting_priority) + 1) % len(tower.targeting_priorities)])
+    def set_auto_start(self, enabled):
+        if self.recorder: self.recorder.action(self, "set_auto_start", enabled)
+        self.auto_start_next_round = enabled
     def save_game(self):
+        # Written by the background save writer (temp file + rename); the main loop only builds the dict
+        if not self.autosave or self.lose or self.win: return # A finished game has nothing to continue
         save_data = {"map_id": self.game.selected_map, "difficulty": self.game.selected_difficulty, "money": self.money, "lives": self.lives, "current_round": self.current_round, "towers": [t.serialize() for t in self.towers]}
-        with open(SAVE_FILE, 'w') as f: json.dump(save_data, f, indent=4)
+        if self.is_round_active and self.mid_round_saves: save_data["round"] = self.snapshot_round()
+        save_writer.write(SAVE_FILE, save_data)
     def load_game(self):
         try:
+            save_writer.flush() # A save may still be on its way to disk
             with open(SAVE_FILE, 'r') as f: save_data = json.load(f)
             self.game.selected_map, self.game.selected_difficulty = save_data['map_id'], save_data['difficulty']
-            self.start_new_game(self.game.selected_map, self.game.selected_difficulty)
+            self.start_new_game(self.game.selected_map, self.game.selected_difficulty); self.recorder = None # Never append a resumed game to another game's log
             self.money, self.lives, self.current_round = save_data['money'], save_data['lives'], save_data['current_round']
-            self.towers = [DogTower.deserialize(data) for data in save_data['towers']]; return True
+            self.towers = [DogTower.deserialize(data) for data in save_data['towers']]
+            for tower in self.towers: self.placement_raster.add_tower((tower.x, tower.y))
+            if "round" in save_data: self.restore_round(save_data["round"])
+            return True
         except (FileNotFoundError, json.JSONDecodeError): return False
+    def has_save(self): return save_writer.exists(SAVE_FILE)
     def delete_save(self):
-        if os.path.exists(SAVE_FILE): os.remove(SAVE_FILE)
+        if self.autosave: save_writer.delete(SAVE_FILE)
+
+    def snapshot_round(self):
+        """The round in progress: each enemy as a path and a distance along it, projectiles in flight, tower cooldowns,
+        status-effect time left and the spawn scheduler's cursor. Enemies are listed in uid order."""
+        path_ids, tower_ids, now = {id(p): i for i, p in enumerate(self.path_tables)}, {id(t): i for i, t in enumerate(self.towers)}, self.status_timers.now
+        enemies = sorted((e for e in self.enemies if e.is_active), key=lambda e: e.uid); enemy_ids = {id(e): i for i, e in enumerate(enemies)}
+        projectiles = [p for p in self.projectiles if p.is_active and id(p.target) in enemy_ids]; sold = []
+        # Shots fired by a tower that has since been sold still land (and are still counted in their target's incoming damage),
+        # so their owner is saved after the placed towers and restored without being placed
+        for p in projectiles:
+            if id(p.owner) not in tower_ids: tower_ids[id(p.owner)] = len(self.towers) + len(sold); sold.append(p.owner.serialize())
+        return {"round_timer": self.round_timer, "spawns": self.spawn_scheduler.state(), "cooldowns": [t.cooldown for t in self.towers], "sold_towers": sold,
+                "enemies": [{"id": e.enemy_id, "path": path_ids[id(e.path)], "distance": e.distance_travelled, "tier": e.tier, "speed": e.speed_base, "count": e.stack_count,
+                             "properties": list(e.properties), "incoming": e.incoming_damage_tiers, "effects": {k: expires - now for k, expires in e.status_effects.items()}} for e in enemies],
+                "projectiles": [{"owner": tower_ids[id(p.owner)], "target": enemy_ids[id(p.target)], "pos": [p.pos.x, p.pos.y], "speed": p.speed, "damage": p.damage_tier,
+                                 "lead": p.can_pop_lead, "aoe": p.is_area_of_effect, "blast_radius": p.blast_radius} for p in projectiles]}
+
+    def restore_round(self, snapshot):
+        """Resumes a round saved by snapshot_round() on top of the loaded towers. Enemies get fresh uids in their saved
+        order, so every tie-break (and each stack's consecutive uid range) is preserved."""
+        self.is_round_active, self.round_timer = True, snapshot["round_timer"]
+        self.spawn_scheduler = SpawnScheduler(ROUND_COMPOSITIONS[self.current_round - 1], self.path_tables); self.spawn_scheduler.restore(snapshot["spawns"])
+        for tower, cooldown in zip(self.towers, snapshot["cooldowns"]): tower.cooldown = cooldown
+        for data in snapshot["enemies"]:
+            enemy = self._acquire_enemy(data["id"], self.path_tables[data["path"]], reserve_uids(data["count"]))
+            enemy.stack_count, enemy.tier, enemy.speed_base, enemy.incoming_damage_tiers = data["count"], data["tier"], data["speed"], data["incoming"]
+            enemy.properties[:] = data["properties"]; enemy.place_at(data["distance"]); self.enemies.append(enemy)
+            for effect, time_left in data["effects"].items(): self.status_timers.apply(enemy, effect, time_left)
+        owners = self.towers + [DogTower.deserialize(data) for data in snapshot.get("sold_towers", [])]
+        for data in snapshot["projectiles"]:
+            proj = self.projectile_pool.acquire(owners[data["owner"]]); proj.target = self.enemies[data["target"]]; proj.pos.update(data["pos"])
+            proj.speed, proj.damage_tier, proj.can_pop_lead, proj.is_area_of_effect, proj.blast_radius = data["speed"], data["damage"], data["lead"], data["aoe"], data["blast_radius"]
+            self.projectiles.append(proj)
+        if self.enemy_store: self.enemy_grid.rebuild_arrays(*self.enemy_store.active_columns())
+        else: self.enemy_grid.rebuild(self.enemies)
+        self.progress_index.rebuild(self.enemies)
@@ -1,137 +1,182 @@
 # game_objects.py
-import math
+import math, itertools
+from collections import namedtuple
+from functools import lru_cache
 import pygame
 from assets import DOG_TOWERS, GEOMETRIC_ENEMIES
+from path_table import PathTable
+from status_effects import speed_multiplier
 
 TIER_TO_ENEMY_ID = {1:"red_triangle", 2:"blue_square", 3:"green_pentagon", 4:"yellow_hexagon", 5:"pink_octagon", 6:"white_decagon", 7:"black_dodecagon", 10:"ceramic_star", 20:"reinforced_star"}
+_enemy_uids = itertools.count() # Spawn order; every targeting and AoE tie breaks on it
 
-class VisualEffect:
-    # --- BUG FIX: Corrected __init__ and added radius ---
-    def __init__(self, type, pos, lifetime=0.5, start_pos=None, end_pos=None, radius=0):
-        self.type = type
-        self.pos = pos
-        self.lifetime = lifetime
-        self.start_pos = start_pos
-        self.end_pos = end_pos
-        self.radius = radius
-        
-    def update(self, dt):
-        self.lifetime -= dt
-        return self.lifetime > 0
+def reserve_uids(count):
+    """First of `count` consecutive uids, as `count` separately spawned enemies would have taken."""
+    first = next(_enemy_uids)
+    for _ in range(count - 1): next(_enemy_uids)
+    return first
+
+def is_upgrade_path_locked(upgrades, path_index):
+    """Crosspath rule: one path may go past tier 2, one other path may reach tier 2, the third stays at 0."""
+    return (upgrades[path_index] >= 2 and any(p > 2 for i, p in enumerate(upgrades) if i != path_index)) or \
+           (any(p > 2 for p in upgrades) and upgrades[path_index] < 2) or \
+           (upgrades[path_index] >= 2 and upgrades.count(2) > 0 and (upgrades.index(2) if 2 in upgrades else -1) != path_index)
+
+def legal_upgrade_combos():
+    """Every upgrade tuple reachable from (0, 0, 0) by buying one tier at a time under the crosspath rule."""
+    seen, frontier = {(0, 0, 0)}, [(0, 0, 0)]
+    while frontier:
+        upgrades = frontier.pop()
+        for path_index in range(3):
+            if upgrades[path_index] >= 5 or is_upgrade_path_locked(upgrades, path_index): continue
+            nxt = upgrades[:path_index] + (upgrades[path_index] + 1,) + upgrades[path_index+1:]
+            if nxt not in seen: seen.add(nxt); frontier.append(nxt)
+    return sorted(seen)
+
+# One immutable stat block per (tower_id, upgrades), shared by every tower with that build; stats no tower defines read as None
+STAT_NAMES = tuple(sorted({stat for data in DOG_TOWERS.values() for stat in data["base_stats"]} |
+                          {stat for data in DOG_TOWERS.values() for path in data["upgrades"].values() for upgrade in path for stat in upgrade["stat_changes"]}))
+TowerStats = namedtuple("TowerStats", STAT_NAMES, defaults=(None,) * len(STAT_NAMES))
+MULTIPLIED_STATS = ("attack_speed", "range", "blast_radius") # Upgrades scale these; every other numeric change replaces the value
+
+def apply_stat_changes(stats, stat_changes):
+    for stat, value in stat_changes.items():
+        if isinstance(value,(int,float)) and stat in stats and isinstance(stats[stat],(int,float)):
+            if stat in MULTIPLIED_STATS: stats[stat] *= value
+            else: stats[stat] = value
+        else: stats[stat] = value
+
+@lru_cache(maxsize=None)
+def compile_stats(tower_id, upgrades):
+    """Base stats with each path's tiers applied path by path. Call compile_stats.cache_clear() after editing DOG_TOWERS."""
+    tower_data, stats = DOG_TOWERS[tower_id], dict(DOG_TOWERS[tower_id]["base_stats"])
+    for path_index, tier in enumerate(upgrades):
+        for upgrade in tower_data["upgrades"][f"path{path_index+1}"][:tier]: apply_stat_changes(stats, upgrade["stat_changes"])
+    return TowerStats(**{stat: value for stat, value in stats.items() if stat in TowerStats._fields})
 
 class DogTower:
     # --- (Unchanged) ---
     def __init__(self, tower_id, position):
         self.tower_id, self.pos, self.x, self.y = tower_id, pygame.Vector2(position), position[0], position[1]
         self.base_data = DOG_TOWERS[self.tower_id]
-        self.name, self.stats = self.base_data["name"], self.base_data["base_stats"].copy()
+        self.name, self.stats = self.base_data["name"], compile_stats(tower_id, (0, 0, 0))
         self.upgrades, self.target, self.cooldown, self.total_cost = [0, 0, 0], None, 0, self.base_data["cost"]
         self.rect = pygame.Rect(self.x-25, self.y-25, 50, 50)
         self.targeting_priorities, self.targeting_priority = ["first", "last", "strong", "close"], "first"
         self.pop_count = 0
-    def get_stat(self, stat_name): return self.stats.get(stat_name)
-    def find_target(self, enemies):
-        in_range = [e for e in enemies if self.pos.distance_to(e.pos) <= self.get_stat("range") and ("camo" not in e.properties or self.get_stat("can_see_camo")) and e.tier - e.incoming_damage_tiers > 0]
+    def get_stat(self, stat_name): return getattr(self.stats, stat_name, None)
+    def find_target(self, enemies, enemy_grid=None, progress_index=None):
+        # Ties fall back to spawn order (uid)
+        stats = self.stats; tower_range, sees_camo = stats.range, stats.can_see_camo
+        if progress_index is not None and self.targeting_priority != "close":
+            self.target = progress_index.find(self.targeting_priority, self.pos, tower_range, sees_camo); return
+        candidates = enemy_grid.query_radius(self.pos, tower_range) if enemy_grid else [e for e in enemies if self.pos.distance_to(e.pos) <= tower_range]
+        in_range = [e for e in candidates if ("camo" not in e.properties or sees_camo) and e.tier - e.incoming_damage_tiers > 0]
         if not in_range: self.target = None; return
-        if self.targeting_priority == "first": in_range.sort(key=lambda e: e.distance_travelled, reverse=True)
-        elif self.targeting_priority == "last": in_range.sort(key=lambda e: e.distance_travelled)
-        elif self.targeting_priority == "strong": in_range.sort(key=lambda e: e.tier, reverse=True)
-        elif self.targeting_priority == "close": in_range.sort(key=lambda e: self.pos.distance_to(e.pos))
-        self.target = in_range[0]
-    def update(self, dt, enemies):
+        if self.targeting_priority == "first": self.target = min(in_range, key=lambda e: (-e.distance_travelled, e.uid))
+        elif self.targeting_priority == "last": self.target = min(in_range, key=lambda e: (e.distance_travelled, e.uid))
+        elif self.targeting_priority == "strong": self.target = min(in_range, key=lambda e: (-e.tier, e.uid))
+        else: self.target = min(in_range, key=lambda e: (self.pos.distance_to(e.pos), e.uid))
+    def update(self, dt, enemies, enemy_grid=None, progress_index=None):
         if self.cooldown > 0: self.cooldown -= dt
-        self.find_target(enemies)
-    def can_attack(self): return self.cooldown <= 0 and self.target and self.stats.get("attack_speed", 0) > 0
-    def attack(self, enemies_list, sound_manager):
-        self.cooldown = 1.0 / self.get_stat("attack_speed")
-        projectiles, visual_effects = [], []
+        self.find_target(enemies, enemy_grid, progress_index)
+    def can_attack(self): return self.cooldown <= 0 and self.target and (self.stats.attack_speed or 0) > 0
+    def attack(self, game_engine):
+        stats = self.stats; self.cooldown = 1.0 / stats.attack_speed
+        if self.target.stack_count > 1: self.target = game_engine.split_stack(self.target) # Only the lowest-uid member is hit
+        projectiles = []
         sound_map = {"corgi_cannon": "shoot_cannon", "greyhound_sniper": "shoot_sniper"}
-        sound_manager.play_sound(sound_map.get(self.tower_id, 'shoot_bark'))
-        if self.get_stat("is_hitscan"):
+        game_engine.sound_manager.play_sound(sound_map.get(self.tower_id, 'shoot_bark'))
+        if stats.is_hitscan:
             if self.target:
-                newly_spawned = self.target.take_damage(self.get_stat("damage_tier_reduction"), self, sound_manager)
-                if not self.target.is_active and self.target in enemies_list: enemies_list.remove(self.target)
-                enemies_list.extend(newly_spawned)
-                visual_effects.append(VisualEffect("line_trail", pos=None, start_pos=self.pos, end_pos=self.target.pos, lifetime=0.1))
+                game_engine.damage_enemy(self.target, stats.damage_tier_reduction, self, award_money=False)
+                game_engine.visual_effects.add_line(self.pos, self.target.pos, lifetime=0.1)
         else:
-            for _ in range(self.get_stat("projectile_count") or 1):
+            for _ in range(stats.projectile_count or 1):
                 if self.target:
-                    proj = Projectile(self)
+                    proj = game_engine.projectile_pool.acquire(self)
                     projectiles.append(proj); self.target.add_incoming_damage(proj.damage_tier)
-        return projectiles, visual_effects
+        return projectiles
     def cycle_targeting_priority(self): self.targeting_priority = self.targeting_priorities[(self.targeting_priorities.index(self.targeting_priority) + 1) % len(self.targeting_priorities)]
-    def apply_upgrade(self, path_index, upgrade_data):
-        for stat, value in upgrade_data['stat_changes'].items():
-            if isinstance(value,(int,float)) and stat in self.stats and isinstance(self.stats[stat],(int,float)):
-                if stat in ["attack_speed","range","blast_radius"]: self.stats[stat] *= value
-                else: self.stats[stat] = value
-            else: self.stats[stat] = value
+    def apply_upgrade(self, path_index):
+        """Adds the next tier on a path (its cost goes into total_cost) and re-binds the shared stat block for the new build."""
+        self.total_cost += self.base_data['upgrades'][f'path{path_index+1}'][self.upgrades[path_index]]['cost']
+        self.upgrades[path_index] += 1; self.stats = compile_stats(self.tower_id, tuple(self.upgrades))
     def get_sell_value(self): return int(self.total_cost * 0.7)
-    def serialize(self): return {"tower_id":self.tower_id,"position":[self.x,self.y],"upgrades":self.upgrades,"pop_count":self.pop_count,"targeting":self.targeting_priority}
+    def serialize(self): return {"tower_id":self.tower_id,"position":[self.x,self.y],"upgrades":list(self.upgrades),"pop_count":self.pop_count,"targeting":self.targeting_priority}
     @staticmethod
     def deserialize(data):
         tower = DogTower(data['tower_id'], data['position'])
         tower.pop_count = data.get("pop_count", 0); tower.targeting_priority = data.get("targeting", "first")
-        temp_upgrades = data['upgrades']; tower.upgrades = [0,0,0] 
-        for path_index, tier in enumerate(temp_upgrades):
-            if tier > 0:
-                for i in range(tier):
-                    upgrade_data = DOG_TOWERS[tower.tower_id]['upgrades'][f'path{path_index+1}'][i]
-                    tower.apply_upgrade(path_index, upgrade_data); tower.total_cost += upgrade_data['cost']; tower.upgrades[path_index] += 1
+        tower.upgrades = list(data['upgrades']); tower.stats = compile_stats(tower.tower_id, tuple(tower.upgrades))
+        tower.total_cost += sum(upgrade['cost'] for path_index, tier in enumerate(tower.upgrades) for upgrade in tower.base_data['upgrades'][f'path{path_index+1}'][:tier])
         return tower
 
 class GeometricEnemy:
     # --- (Unchanged) ---
-    def __init__(self, enemy_id, path): self.enemy_id,self.path=enemy_id,path; self.base_data=GEOMETRIC_ENEMIES[self.enemy_id]; self.tier,self.speed_base=self.base_data["tier"],self.base_data["speed"]; self.speed_multiplier=1.0; self.money_on_hit,self.children_on_pop=self.base_data["money"],self.base_data["children"]; self.properties=self.base_data.get("properties",[]).copy(); self.pos=pygame.Vector2(self.path[0]); self.path_index,self.distance_travelled=0,0; self.is_active=True; self.rect=pygame.Rect(self.pos.x-15,self.pos.y-15,30,30); self.incoming_damage_tiers=0; self.status_effects={}
-    def update(self, dt):
-        self.speed_multiplier = 1.0; effects_to_remove = []
-        for effect, timer in self.status_effects.items():
-            timer -= dt
-            if timer <= 0: effects_to_remove.append(effect)
-            else: self.status_effects[effect] = timer; self.speed_multiplier *= 0.5
-        for effect in effects_to_remove: del self.status_effects[effect]
-        self.move(dt)
+    # A stack stands for stack_count identical co-located members with the consecutive uids uid .. uid+stack_count-1:
+    # pop children move, index and draw as one entity until a tower singles out a member (see split_off)
+    def __init__(self, enemy_id, path, uid=None): self.pool=None; self.rect=pygame.Rect(0,0,30,30); self.properties=[]; self.status_effects={}; self.reset(enemy_id, path, uid=uid)
+    def reset(self, enemy_id, path, uid=None):
+        # Fresh state and a new uid (unless given); the rect, property list and status dict of a pooled instance are reused, not reallocated
+        self.enemy_id=enemy_id; self.path=path if isinstance(path, PathTable) else PathTable.for_points(path); self.base_data=GEOMETRIC_ENEMIES[self.enemy_id]; self.tier,self.speed_base=self.base_data["tier"],self.base_data["speed"]; self.speed_multiplier=1.0; self.money_on_hit,self.children_on_pop=self.base_data["money"],self.base_data["children"]; self.properties[:]=self.base_data.get("properties",[]); self.pos=self.path.point_at(0); self.distance_travelled=0; self.is_active=True; self.rect.update(self.pos.x-15,self.pos.y-15,30,30); self.incoming_damage_tiers=0; self.status_effects.clear(); self.uid=next(_enemy_uids) if uid is None else uid; self.stack_count=1
+    def update(self, dt): self.move(dt) # Status effects are started and expired by the engine's StatusEffectTimers
     def move(self, dt):
-        if not self.is_active or self.path_index >= len(self.path)-1: self.is_active=False; return
-        dist_to_move = (self.speed_base * self.speed_multiplier) * 50 * dt
-        while dist_to_move > 0 and self.path_index < len(self.path)-1:
-            target, seg, seg_len = pygame.Vector2(self.path[self.path_index+1]), pygame.Vector2(self.path[self.path_index+1])-self.pos, (pygame.Vector2(self.path[self.path_index+1])-self.pos).length()
-            if seg_len==0: self.path_index+=1; continue
-            if dist_to_move >= seg_len: dist_to_move-=seg_len; self.distance_travelled+=seg_len; self.pos,self.path_index=target,self.path_index+1
-            else: self.pos+=seg.normalize()*dist_to_move; self.distance_travelled+=dist_to_move; dist_to_move=0
-        self.rect.center = self.pos
-    def apply_status_effect(self, effect, duration): self.status_effects[effect] = duration
-    def take_damage(self, damage, owner_tower, sound_manager):
-        can_pop_lead = owner_tower.get_stat("can_pop_lead")
+        # Position is a pure function of distance_travelled on the precomputed PathTable; updated in place, no per-tick vectors
+        if not self.is_active or self.distance_travelled >= self.path.total_length: self.is_active=False; return
+        self.distance_travelled = min(self.distance_travelled + (self.speed_base * self.speed_multiplier) * 50 * dt, self.path.total_length)
+        self.path.point_at(self.distance_travelled, self.pos); self.rect.center = self.pos
+    def place_at(self, distance): self.distance_travelled = distance; self.pos = self.path.point_at(distance); self.rect.center = self.pos
+    @property
+    def path_index(self): return self.path.segment_index_at(self.distance_travelled)
+    def refresh_speed(self): self.speed_multiplier = speed_multiplier(self.status_effects)
+    def take_damage(self, damage, owner_tower, sound_manager, status_timers):
+        owner_stats = owner_tower.stats; can_pop_lead = owner_stats.can_pop_lead
         if "lead" in self.properties and not can_pop_lead: return []
         if "shielded" in self.properties: self.properties.remove("shielded"); return []
-        actual_damage=min(self.tier,damage); owner_tower.pop_count+=actual_damage; self.tier-=damage
+        # Every member of a stack takes the same hit, so the stack as a whole pops, slows or tiers down together
+        actual_damage=min(self.tier,damage); owner_tower.pop_count+=actual_damage*self.stack_count; self.tier-=damage
         sound_manager.play_sound('pop')
-        if owner_tower.get_stat("adds_slow"): self.apply_status_effect('slow', owner_tower.get_stat("adds_slow")['duration'])
+        if owner_stats.adds_slow: status_timers.apply(self, 'slow', owner_stats.adds_slow['duration'])
         if self.tier <= 0:
             self.is_active=False; new_children = []
-            for child_id, count in self.children_on_pop.items():
-                for _ in range(count): child=GeometricEnemy(child_id,self.path); child.pos,child.path_index,child.distance_travelled=self.pos.copy(),self.path_index,self.distance_travelled; new_children.append(child)
+            # Members pop in uid order, each spawning its children in turn; one child type keeps all of them consecutive
+            if len(self.children_on_pop) == 1: groups = [(child_id, count * self.stack_count) for child_id, count in self.children_on_pop.items()]
+            else: groups = [group for _ in range(self.stack_count) for group in self.children_on_pop.items()]
+            for child_id, count in groups:
+                if count > 0: child=self._make_child(child_id, count); child.place_at(self.distance_travelled); new_children.append(child)
             return new_children
         else:
             new_id = next((TIER_TO_ENEMY_ID[t] for t in sorted(TIER_TO_ENEMY_ID.keys(), reverse=True) if t <= self.tier), None)
             if new_id and new_id != self.enemy_id: self.enemy_id=new_id; self.base_data=GEOMETRIC_ENEMIES[self.enemy_id]; self.speed_base=self.base_data["speed"]; self.money_on_hit,self.children_on_pop=self.base_data["money"],self.base_data["children"]
             return []
+    def _make_child(self, child_id, count=1):
+        child = self._new_enemy(child_id, reserve_uids(count)); child.stack_count = count; return child
+    def _new_enemy(self, enemy_id, uid): return self.pool.acquire(enemy_id, self.path, uid=uid) if self.pool else GeometricEnemy(enemy_id, self.path, uid)
+    def split_off(self):
+        """Detaches the lowest-uid member of a stack as a single enemy in the same state; the stack keeps the rest."""
+        member = self._new_enemy(self.enemy_id, self.uid); self._copy_state(member); self.uid += 1; self.stack_count -= 1
+        return member
+    def _copy_state(self, member):
+        member.base_data, member.tier, member.speed_base, member.speed_multiplier = self.base_data, self.tier, self.speed_base, self.speed_multiplier
+        member.money_on_hit, member.children_on_pop = self.money_on_hit, self.children_on_pop
+        member.properties[:] = self.properties; member.status_effects.update(self.status_effects); member.place_at(self.distance_travelled)
     def add_incoming_damage(self, amount): self.incoming_damage_tiers += amount
     def remove_incoming_damage(self, amount): self.incoming_damage_tiers = max(0, self.incoming_damage_tiers - amount)
     def get_tier(self): return GEOMETRIC_ENEMIES[self.enemy_id]['tier']
 
 class Projectile:
     # --- (Unchanged) ---
-    def __init__(self, owner_tower):
-        self.owner, self.pos, self.target = owner_tower, owner_tower.pos.copy(), owner_tower.target
-        self.speed = owner_tower.get_stat("projectile_speed") or 400
-        self.damage_tier, self.can_pop_lead = owner_tower.get_stat("damage_tier_reduction"), owner_tower.get_stat("can_pop_lead")
-        self.is_active = True; self.is_area_of_effect = owner_tower.get_stat("is_area_of_effect"); self.blast_radius = owner_tower.get_stat("blast_radius")
+    def __init__(self, owner_tower): self.pool = None; self.pos = pygame.Vector2(); self.reset(owner_tower)
+    def reset(self, owner_tower):
+        self.owner, self.target = owner_tower, owner_tower.target; self.pos.update(owner_tower.pos)
+        stats = owner_tower.stats; self.speed = stats.projectile_speed or 400
+        self.damage_tier, self.can_pop_lead = stats.damage_tier_reduction, stats.can_pop_lead
+        self.is_active = True; self.is_area_of_effect = stats.is_area_of_effect; self.blast_radius = stats.blast_radius
     def update(self, dt):
         if not self.is_active or not self.target or not self.target.is_active: self.cleanup(); return
         direction = self.target.pos-self.pos
-        if direction.length() < self.speed*dt: self.pos = self.target.pos
+        if direction.length() < self.speed*dt: self.pos.update(self.target.pos) # Copy, never alias the target's vector
         else: self.pos += direction.normalize() * self.speed * dt
     def check_collision(self): return self.pos.distance_to(self.target.pos) < 10
     def cleanup(self):
@@ -1,17 +1,25 @@
 # main.py
+import time; PROCESS_START = time.perf_counter() # --startup-profile measures from here
 import pygame
-from utilities import SCREEN_WIDTH, SCREEN_HEIGHT, GAME_TITLE, COLOR_PALETTES
+from utilities import SCREEN_WIDTH, SCREEN_HEIGHT, GAME_TITLE, COLOR_PALETTES, MAP_CACHE_DIR, SPRITE_ATLAS_DIR, PROFILE_TRACE_FILE, STARTUP_BUDGET_MS
+from utilities import SIM_DT, MAX_TICKS_PER_FRAME, MAX_SPEED_FRAME_BUDGET
 from ui_manager import UIManager
 from game_engine import GameEngine
 from renderer import Renderer
 from sound_manager import SoundManager
 import traceback # Import traceback to print detailed errors
+import argparse
+from profiler import profiler, StartupTimer
+from save_writer import save_writer
+from text_cache import text_cache
 
 class Game:
-    def __init__(self):
-        pygame.init()
+    def __init__(self, record_path=None, startup_profile=False):
+        self.startup, self.startup_profile = StartupTimer(PROCESS_START), startup_profile; self.startup.mark("imports")
+        pygame.display.init(); pygame.font.init() # Not pygame.init(): the mixer is opened by SoundManager's loader thread
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption(GAME_TITLE)
+        self.startup.mark("display")
         self.clock = pygame.time.Clock()
         self.running = True
 
@@ -19,35 +27,61 @@ class Game:
         self.previous_game_state = 'main_menu'
         self.selected_map = None
         self.selected_difficulty = 'medium'
-        self.game_speed = 1.0
+        self.game_speed = 1.0 # A GAME_SPEEDS entry; None is "as fast as possible"
+        self.sim_backlog = 0.0 # Game time owed to the simulation that doesn't yet add up to a whole tick
+        self.record_path = record_path # Each new game's input log is written here (see replay.py)
 
-        self.sound_manager = SoundManager()
-        self.renderer = Renderer(self.screen)
-        self.game_engine = GameEngine(self)
-        self.ui_manager = UIManager(self)
+        self.sound_manager = SoundManager(); self.startup.mark("sound manager")
+        self.renderer = Renderer(self.screen, map_cache_dir=MAP_CACHE_DIR, atlas_dir=SPRITE_ATLAS_DIR); self.startup.mark("renderer")
+        self.game_engine = GameEngine(self); self.startup.mark("game engine")
+        self.ui_manager = UIManager(self); self.startup.mark("ui")
         self.sound_manager.play_music()
 
     def run(self):
         while self.running:
-            events = pygame.event.get()
-            for event in events:
-                if event.type == pygame.QUIT:
-                    self.sound_manager.save_settings(); self.running = False
-                self.ui_manager.handle_events(events)
+            profiler.begin_frame()
+            with profiler.section("events"):
+                events = pygame.event.get()
+                for event in events:
+                    if event.type == pygame.QUIT:
+                        if self.game_state in ('in_game', 'paused'): self.game_engine.save_game() # Mid-round saves resume exactly
+                        self.sound_manager.save_settings(); self.save_recording(); self.running = False
+                self.ui_manager.handle_events(events) # Once per frame: it walks the whole event list itself
 
-            self.ui_manager.update(self.game_engine)
+            with profiler.section("ui.update"): self.ui_manager.update(self.game_engine)
             
+            with profiler.section("wait"): frame_ms = self.clock.tick(60) # Time left in the 60 FPS budget, spent sleeping
             if self.game_state == 'in_game':
-                dt = (self.clock.tick(60) / 1000.0) * self.game_speed
-                self.game_engine.update(dt)
-            else:
-                self.clock.tick(60)
+                with profiler.section("engine.update"): self.advance_simulation(frame_ms / 1000.0)
+            with profiler.section("sound"): self.sound_manager.flush() # This frame's clicks, shots and pops, coalesced
 
-            self.screen.fill(COLOR_PALETTES['default']['background'])
-            self.render()
-            pygame.display.flip()
+            with profiler.section("render"):
+                self.screen.fill(COLOR_PALETTES['default']['background'])
+                self.render()
+                if profiler.enabled: # Text cache counts cover one frame; the reset after the overlay keeps its own text out of them
+                    self.renderer.draw_profiler_overlay(profiler, self.sound_manager.stats, text_cache.stats()); text_cache.reset_stats()
+            with profiler.section("flip"): pygame.display.flip()
+            profiler.end_frame()
+            if self.startup:
+                self.startup.mark("first frame")
+                if self.startup_profile: print(self.startup.report(STARTUP_BUDGET_MS))
+                self.startup = None
 
-        pygame.quit()
+        save_writer.flush(); pygame.quit()
+
+    def advance_simulation(self, frame_seconds):
+        """Runs whole SIM_DT ticks for this frame's share of game time, so every speed plays out exactly like 1x
+        (and like the headless simulation); only the final state is rendered. Returns the number of ticks run."""
+        engine, ticks = self.game_engine, 0
+        if self.game_speed is None: # As fast as possible: tick until this frame's budget is spent
+            deadline = time.perf_counter() + MAX_SPEED_FRAME_BUDGET; self.sim_backlog = 0.0
+            while engine.is_round_active and not (engine.lose or engine.win) and (ticks == 0 or time.perf_counter() < deadline): engine.update(SIM_DT); ticks += 1
+            if ticks: return ticks
+        self.sim_backlog += frame_seconds * (self.game_speed or 1.0) # Between rounds, "as fast as possible" runs at 1x
+        ticks = min(int(self.sim_backlog / SIM_DT + 1e-9), MAX_TICKS_PER_FRAME)
+        self.sim_backlog = 0.0 if ticks == MAX_TICKS_PER_FRAME else max(0.0, self.sim_backlog - ticks * SIM_DT) # Capped: drop the rest instead of spiralling
+        for _ in range(ticks): engine.update(SIM_DT)
+        return ticks
 
     def render(self):
         if self.game_state == 'main_menu':
@@ -69,12 +103,46 @@ class Game:
 
     def start_game(self, map_id, difficulty):
         self.selected_map = map_id; self.selected_difficulty = difficulty
-        self.game_engine.start_new_game(map_id, difficulty)
+        self.save_recording(); self.game_engine.start_new_game(map_id, difficulty)
+        if self.record_path:
+            from replay import InputRecorder
+            self.game_engine.recorder = InputRecorder(map_id, difficulty, self.record_path)
         self.change_state('in_game')
 
+    def export_profile(self):
+        path = time.strftime(PROFILE_TRACE_FILE)
+        print(f"Saved {profiler.export_chrome_trace(path)} trace events to {path} (open in chrome://tracing or ui.perfetto.dev)")
+
+    def save_recording(self):
+        if self.game_engine.recorder: self.game_engine.recorder.save(); self.game_engine.recorder = None
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=GAME_TITLE)
+    parser.add_argument("--headless", action="store_true", help="Run the simulation without a window, audio or UI")
+    parser.add_argument("--map", default="map1", help="Map id for headless mode (e.g. map1)")
+    parser.add_argument("--difficulty", default="medium", choices=["easy", "medium", "hard"])
+    parser.add_argument("--layout", help="JSON tower layout (list of {tower_id, position, upgrades, targeting})")
+    parser.add_argument("--rounds", type=int, default=None, help="Number of rounds to play (default: all)")
+    parser.add_argument("--dt", type=float, default=1/60, help="Fixed simulation timestep in seconds")
+    parser.add_argument("--enemy-store", action="store_true", help="Use the NumPy array-backed enemy store (headless mode)")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary line")
+    parser.add_argument("--record", metavar="PATH", help="Record each new game's input log to PATH (.gz to compress)")
+    parser.add_argument("--profile", action="store_true", help="Start with the frame profiler overlay on (toggle with F3)")
+    parser.add_argument("--startup-profile", action="store_true", help=f"Print how long each startup phase took up to the first frame (budget {STARTUP_BUDGET_MS} ms)")
+    parser.add_argument("--replay", metavar="PATH", help="Re-simulate a recorded input log headlessly and check it for desyncs")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.headless:
+        from simulation import run_headless
+        run_headless(args); raise SystemExit(0)
+    if args.replay:
+        from replay import run_replay
+        raise SystemExit(run_replay(args))
     try:
-        game_instance = Game()
+        if args.profile: profiler.set_enabled(True)
+        game_instance = Game(record_path=args.record, startup_profile=args.startup_profile)
         game_instance.run()
     except Exception as e:
         print("\n--- A FATAL ERROR OCCURRED ---")
@@ -0,0 +1,46 @@
+# path_table.py
+# Precomputed arc-length tables for the map path polylines: an enemy's position is a lookup on distance_travelled.
+# Distance is accumulated as one scalar, whereas the old segment walk accumulated screen coordinates (e.g. 720 - steps on a
+# downward segment). The two round differently, so an enemy can reach the end of a path one tick earlier or later than it
+# used to; some rounds on map3 and map9 end a tick apart, with the same leaks, money and pops.
+from bisect import bisect_right
+import pygame
+
+class PathTable:
+    """Cumulative arc length at every vertex of one path. Still indexes/iterates like the raw list of points."""
+    _cache = {}
+    def __init__(self, points):
+        self.points = [tuple(p) for p in points]
+        self.xs, self.ys, self.cumulative = [float(self.points[0][0])], [float(self.points[0][1])], [0.0]
+        for x, y in self.points[1:]:
+            length = pygame.Vector2(x - self.xs[-1], y - self.ys[-1]).length()
+            if length == 0: continue # Zero-length segments would make the bisect ambiguous
+            self.xs.append(float(x)); self.ys.append(float(y)); self.cumulative.append(self.cumulative[-1] + length)
+        self.total_length, self.last_segment = self.cumulative[-1], len(self.cumulative) - 2
+
+    @classmethod
+    def for_points(cls, points):
+        """Memoized per distinct polyline, so every map load after the first reuses its tables."""
+        key = tuple(tuple(p) for p in points)
+        table = cls._cache.get(key)
+        if table is None: table = cls._cache[key] = cls(points)
+        return table
+
+    def segment_index_at(self, distance):
+        if distance <= 0 or self.last_segment < 0: return 0
+        return min(bisect_right(self.cumulative, distance) - 1, self.last_segment)
+
+    def point_at(self, distance, out=None):
+        """Position after travelling `distance` along the path (clamped to its ends). Writes into `out` when given."""
+        if self.last_segment < 0 or distance <= 0: x, y = self.xs[0], self.ys[0]
+        elif distance >= self.total_length: x, y = self.xs[-1], self.ys[-1]
+        else:
+            i = bisect_right(self.cumulative, distance) - 1; start = self.cumulative[i]
+            t = (distance - start) / (self.cumulative[i+1] - start)
+            x, y = self.xs[i] + (self.xs[i+1] - self.xs[i]) * t, self.ys[i] + (self.ys[i+1] - self.ys[i]) * t
+        if out is None: return pygame.Vector2(x, y)
+        out.update(x, y); return out
+
+    def __len__(self): return len(self.points)
+    def __getitem__(self, index): return self.points[index]
+    def __iter__(self): return iter(self.points)
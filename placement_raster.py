@@ -0,0 +1,83 @@
+# placement_raster.py
+# Per-map occupancy bitmap at pixel resolution: path exclusion, land/water class and tower footprints,
+# so GameEngine.is_valid_placement is an O(1) lookup instead of a geometry pass over every path and tower.
+import math
+from utilities import PLAYABLE_WIDTH, SCREEN_HEIGHT, PATH_RESTRICTION_WIDTH
+
+TOWER_SPACING = 40 # A tower can't be placed closer than this to another tower's centre
+
+def _open_interval(a, b, lo, hi):
+    """x-range where lo < a*x + b < hi, as (start, end); None if empty, infinite ends if a == 0."""
+    if a == 0: return (-math.inf, math.inf) if lo < b < hi else None
+    x0, x1 = (lo - b) / a, (hi - b) / a
+    return (min(x0, x1), max(x0, x1))
+
+def _capsule_span(p1, p2, radius, y):
+    """x-range of row y within `radius` of segment p1-p2 (open interval); None if the row misses it."""
+    spans = []
+    for cx, cy in (p1, p2):
+        dy = y - cy
+        if abs(dy) < radius: half = math.sqrt(radius*radius - dy*dy); spans.append((cx - half, cx + half))
+    (x1, y1), (x2, y2) = p1, p2; dx, dy = x2 - x1, y2 - y1; length = math.hypot(dx, dy)
+    if length > 0:
+        # Band where the projection falls inside the segment and the perpendicular distance is under the radius
+        t_span = _open_interval(dx / length**2, ((y - y1) * dy - x1 * dx) / length**2, -1e-12, 1 + 1e-12)
+        perp_span = _open_interval(dy / length, (-x1 * dy - (y - y1) * dx) / length, -radius, radius)
+        if t_span and perp_span:
+            start, end = max(t_span[0], perp_span[0]), min(t_span[1], perp_span[1])
+            if start < end: spans.append((start, end))
+    if not spans: return None
+    return (min(s[0] for s in spans), max(s[1] for s in spans)) # The capsule is convex, so the pieces overlap
+
+class PlacementRaster:
+    """Path and water masks are built once per map and shared; tower occupancy is per game and updated on place/sell."""
+    _terrain_cache = {}
+    def __init__(self, map_id, map_paths, water_areas, width=PLAYABLE_WIDTH + 1, height=SCREEN_HEIGHT):
+        self.width, self.height = width, height
+        if map_id not in self._terrain_cache: self._terrain_cache[map_id] = self._build_terrain(map_paths, water_areas)
+        (self.path_mask, self.water_mask), self.occupancy = self._terrain_cache[map_id], bytearray(width * height)
+
+    def _build_terrain(self, map_paths, water_areas):
+        width, height = self.width, self.height; path_mask, water_mask = bytearray(width * height), bytearray(width * height)
+        def mark(row, start, end, mask): # Sets integer x with start <= x < end on `row`, clipped to the raster
+            start, end = max(0, start), min(width, end)
+            if start < end: offset = row * width; mask[offset + start:offset + end] = b'\x01' * (end - start)
+        for area in water_areas:
+            if area['shape'] == 'rect': # Same half-open test as pygame.Rect.collidepoint
+                for row in range(max(0, area['y']), min(height, area['y'] + area['height'])): mark(row, area['x'], area['x'] + area['width'], water_mask)
+            elif area['shape'] == 'circle':
+                for row in range(max(0, area['cy'] - area['r']), min(height, area['cy'] + area['r'] + 1)):
+                    half = math.sqrt(max(0, area['r']**2 - (row - area['cy'])**2)); mark(row, math.ceil(area['cx'] - half), math.floor(area['cx'] + half) + 1, water_mask)
+        for path in map_paths:
+            for p1, p2 in zip(path, path[1:]):
+                if p1 == p2: continue
+                for row in range(max(0, min(p1[1], p2[1]) - PATH_RESTRICTION_WIDTH), min(height, max(p1[1], p2[1]) + PATH_RESTRICTION_WIDTH + 1)):
+                    span = _capsule_span(p1, p2, PATH_RESTRICTION_WIDTH, row)
+                    if span: mark(row, math.floor(span[0]) + 1, math.ceil(span[1]), path_mask) # Open interval: distance must be < the width
+        return path_mask, water_mask
+
+    def covers(self, pos):
+        """True if pos is an integer pixel inside the raster (anything else falls back to the exact geometry test)."""
+        x, y = pos
+        return x == int(x) and y == int(y) and 0 <= x < self.width and 0 <= y < self.height
+
+    def is_valid(self, is_water_only, pos):
+        i = int(pos[1]) * self.width + int(pos[0])
+        return not self.path_mask[i] and self.water_mask[i] == is_water_only and not self.occupancy[i]
+
+    def _stamp(self, pos, delta):
+        cx, cy = pos; occupancy, width = self.occupancy, self.width
+        for row in range(max(0, math.floor(cy - TOWER_SPACING)), min(self.height, math.ceil(cy + TOWER_SPACING) + 1)):
+            dy = row - cy
+            if abs(dy) >= TOWER_SPACING: continue
+            half = math.sqrt(TOWER_SPACING**2 - dy*dy); offset = row * width
+            for i in range(offset + max(0, math.floor(cx - half) + 1), offset + min(width, math.ceil(cx + half))): occupancy[i] += delta
+
+    def add_tower(self, pos): self._stamp(pos, 1)
+    def remove_tower(self, pos): self._stamp(pos, -1)
+
+    def valid_positions(self, is_water_only, step=10):
+        """Every `step`-th pixel where a tower of the given class may go, e.g. for an auto-placer."""
+        for y in range(0, self.height, step):
+            for x in range(0, self.width, step):
+                if self.is_valid(is_water_only, (x, y)): yield (x, y)
@@ -0,0 +1,27 @@
+# pool.py
+# Free lists for short-lived game objects (projectiles, enemies and their pop children), so pop cascades
+# reuse instances instead of allocating and garbage-collecting hundreds of them per second.
+
+class ObjectPool:
+    """acquire(*args) re-initialises a free instance via its reset(*args), or constructs cls(*args) when none is free.
+    Released instances must no longer be referenced by live game state."""
+    def __init__(self, cls, max_free=4096):
+        self.cls, self.max_free, self.free = cls, max_free, []
+        self.created = self.reused = self.released = self.in_use = self.peak_in_use = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free: obj = self.free.pop(); obj.reset(*args, **kwargs); self.reused += 1
+        else: obj = self.cls(*args, **kwargs); obj.pool = self; self.created += 1
+        self.in_use += 1
+        if self.in_use > self.peak_in_use: self.peak_in_use = self.in_use
+        return obj
+
+    def release(self, obj):
+        self.in_use -= 1; self.released += 1
+        if len(self.free) < self.max_free: self.free.append(obj)
+
+    def release_all(self, objs):
+        for obj in objs: self.release(obj)
+
+    def stats(self):
+        return {"created": self.created, "reused": self.reused, "released": self.released, "in_use": self.in_use, "peak_in_use": self.peak_in_use, "free": len(self.free)}
@@ -0,0 +1,83 @@
+# profiler.py
+# Frame timing: named sections of each frame (events, UI, engine subsystems, rendering) kept in a ring buffer of recent
+# frames, summarized as rolling p50/p99 for the F3 overlay and exportable as Chrome trace-event JSON (chrome://tracing,
+# ui.perfetto.dev). While disabled, section() returns one shared no-op context manager and nothing is timed or stored.
+# StartupTimer covers what happens before the first frame (python main.py --startup-profile).
+import json, time
+from collections import deque
+
+class _NullSection:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL_SECTION = _NullSection()
+
+class _Section:
+    __slots__ = ("profiler", "name", "start", "depth")
+    def __init__(self, profiler, name): self.profiler, self.name = profiler, name
+    def __enter__(self):
+        profiler = self.profiler; self.depth = profiler.depth; profiler.depth += 1; self.start = time.perf_counter_ns(); return self
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns(); profiler = self.profiler; profiler.depth = self.depth
+        profiler.current.append((self.name, self.start, end - self.start, self.depth)); return False
+
+class FrameProfiler:
+    """Wrap hot paths in `with profiler.section("name"):` and bracket each frame with begin_frame()/end_frame().
+    A frame is a list of (name, start_ns, duration_ns, depth); the last `max_frames` frames are kept."""
+    def __init__(self, max_frames=600, stats_every=30):
+        self.enabled, self.max_frames, self.stats_every = False, max_frames, stats_every
+        self.frames, self.current, self.depth, self.frame_start = deque(maxlen=max_frames), [], 0, None
+        self._stats, self._frames_since_stats = [], 0
+
+    def section(self, name): return _Section(self, name) if self.enabled else _NULL_SECTION
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled; self.frames.clear(); self.current, self.depth, self.frame_start = [], 0, None; self._stats = []
+    def toggle(self): self.set_enabled(not self.enabled)
+
+    def begin_frame(self):
+        if self.enabled: self.current, self.depth, self.frame_start = [], 1, time.perf_counter_ns()
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None: return # Toggled on mid-frame: the partial frame is dropped
+        self.current.append(("frame", self.frame_start, time.perf_counter_ns() - self.frame_start, 0))
+        self.frames.append(self.current); self.current, self.frame_start = [], None; self._frames_since_stats += 1
+
+    def stats(self):
+        """[(name, depth, p50_ms, p99_ms)] over the buffered frames, in the latest frame's call order. Per-frame totals
+        are used for sections entered several times a frame; recomputed every `stats_every` frames."""
+        if self._frames_since_stats < self.stats_every and self._stats: return self._stats
+        self._frames_since_stats, per_name, order = 0, {}, {}
+        for frame in self.frames:
+            totals = {}
+            for name, start, duration, depth in frame: totals[name] = totals.get(name, 0) + duration
+            for name, total in totals.items(): per_name.setdefault(name, []).append(total)
+        if self.frames:
+            for name, start, duration, depth in sorted(self.frames[-1], key=lambda s: (s[1], s[3])): order.setdefault(name, depth)
+        self._stats = [(name, depth, _percentile(per_name[name], 0.5) / 1e6, _percentile(per_name[name], 0.99) / 1e6) for name, depth in order.items()]
+        return self._stats
+
+    def export_chrome_trace(self, path):
+        """Writes the buffered frames as complete ("X") trace events, timestamps in microseconds from the first frame."""
+        origin = self.frames[0][-1][1] if self.frames else 0
+        events = [{"name": name, "cat": "frame" if depth == 0 else name.split('.')[0], "ph": "X", "ts": (start - origin) / 1000, "dur": duration / 1000, "pid": 1, "tid": 1}
+                  for frame in self.frames for name, start, duration, depth in frame]
+        with open(path, 'w') as f: json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, separators=(',', ':'))
+        return len(events)
+
+class StartupTimer:
+    """Consecutive named phases from `start` (a perf_counter() taken as early as possible) up to the first frame."""
+    def __init__(self, start=None): self.start = self.last = start if start is not None else time.perf_counter(); self.phases = []
+    def mark(self, name):
+        """Ends the phase that began at the previous mark (or at `start`) and names it."""
+        now = time.perf_counter(); self.phases.append((name, now - self.last)); self.last = now
+    def total(self): return self.last - self.start
+    def report(self, budget_ms=None):
+        lines = [f"  {name:24s} {seconds*1000:8.1f} ms" for name, seconds in self.phases] + [f"  {'time to first frame':24s} {self.total()*1000:8.1f} ms"]
+        if budget_ms is not None: lines.append(f"  {'budget':24s} {budget_ms:8.1f} ms ({'OK' if self.total()*1000 <= budget_ms else 'OVER BUDGET'})")
+        return "Startup:\n" + "\n".join(lines)
+
+def _percentile(values, q):
+    ordered = sorted(values); return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+profiler = FrameProfiler()
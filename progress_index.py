@@ -0,0 +1,127 @@
+# progress_index.py
+# Per-tick ordering of enemies by distance_travelled (per path, and per path and tier) so "first"/"last"/"strong"
+# targeting is a bisect plus a short scan instead of sorting every tower's in-range list.
+from bisect import bisect_left, bisect_right, insort
+from functools import lru_cache
+import math
+
+COVERAGE_EPSILON = 1e-6 # Intervals are padded by this much; every candidate is still checked with the exact range test
+
+@lru_cache(maxsize=4096)
+def coverage_intervals(x, y, radius, path):
+    """Arc-length intervals of `path` (a PathTable) that lie within `radius` of (x, y), merged and sorted."""
+    intervals, r_sq = [], radius * radius
+    for i in range(len(path.cumulative) - 1):
+        x1, y1, dx, dy = path.xs[i], path.ys[i], path.xs[i+1] - path.xs[i], path.ys[i+1] - path.ys[i]
+        # |p1 + t*d - c|^2 <= r^2  ->  a*t^2 + b*t + c <= 0 for t in [0, 1]
+        fx, fy = x1 - x, y1 - y
+        a, b, c = dx*dx + dy*dy, 2 * (fx*dx + fy*dy), fx*fx + fy*fy - r_sq
+        disc = b*b - 4*a*c
+        if disc < 0: continue
+        root = math.sqrt(disc); t0, t1 = max(0.0, (-b - root) / (2*a)), min(1.0, (-b + root) / (2*a))
+        if t0 > t1: continue
+        start, length = path.cumulative[i], path.cumulative[i+1] - path.cumulative[i]
+        lo, hi = start + t0 * length - COVERAGE_EPSILON, start + t1 * length + COVERAGE_EPSILON
+        if intervals and lo <= intervals[-1][1]: intervals[-1] = (intervals[-1][0], max(intervals[-1][1], hi))
+        else: intervals.append((lo, hi))
+    return tuple(intervals)
+
+class _OrderedRun:
+    """Enemies of one path (optionally one tier) sorted by (-distance_travelled, uid): furthest along first."""
+    __slots__ = ('keys', 'enemies')
+    def __init__(self): self.keys, self.enemies = [], []
+    def insert(self, enemy):
+        key = (-enemy.distance_travelled, enemy.uid); i = bisect_left(self.keys, key)
+        self.keys.insert(i, key); self.enemies.insert(i, enemy)
+
+class ProgressIndex:
+    """Invalidated once per tick after movement and built lazily on the first query, so ticks without
+    first/last/strong lookups pay nothing. Pop children and tier drops are patched in as they happen."""
+    def __init__(self): self.enemies, self.by_path, self.by_path_tier, self.tiers = [], None, None, []
+
+    def rebuild(self, enemies):
+        """Marks the index stale; `enemies` is the engine's live list and is read when the index is next needed."""
+        self.enemies, self.by_path, self.by_path_tier = enemies, None, None
+
+    @staticmethod
+    def _runs(enemies, group):
+        runs = {}
+        for enemy in enemies:
+            key = group(enemy); run = runs.get(key)
+            if run is None: run = runs[key] = _OrderedRun()
+            run.keys.append((-enemy.distance_travelled, enemy.uid)); run.enemies.append(enemy)
+        for run in runs.values():
+            pairs = sorted(zip(run.keys, run.enemies)) # Keys are unique (uid), so enemies are never compared
+            run.keys, run.enemies = [k for k, _ in pairs], [e for _, e in pairs]
+        return runs
+
+    def _paths(self):
+        if self.by_path is None: self.by_path = self._runs(self.enemies, lambda e: e.path)
+        return self.by_path
+
+    def _path_tiers(self):
+        if self.by_path_tier is None:
+            by_path_tier = {}
+            for (path, tier), run in self._runs(self.enemies, lambda e: (e.path, e.tier)).items(): by_path_tier.setdefault(path, {})[tier] = run
+            self.by_path_tier, self.tiers = by_path_tier, sorted({t for runs in by_path_tier.values() for t in runs}, reverse=True)
+        return self.by_path_tier
+
+    def insert(self, enemy):
+        """Call after the enemy has been added to the live list; only an already-built index needs patching."""
+        if self.by_path is not None:
+            run = self.by_path.get(enemy.path)
+            if run is None: run = self.by_path[enemy.path] = _OrderedRun()
+            run.insert(enemy)
+        self.retier(enemy)
+
+    def insert_many(self, enemies):
+        for enemy in enemies: self.insert(enemy)
+
+    def retier(self, enemy):
+        """Files the enemy under its current tier; the entry left under the old tier is skipped lazily."""
+        if self.by_path_tier is None: return
+        tier_runs = self.by_path_tier.setdefault(enemy.path, {}); tier_run = tier_runs.get(enemy.tier)
+        if tier_run is None:
+            tier_run = tier_runs[enemy.tier] = _OrderedRun()
+            if enemy.tier not in self.tiers: insort(self.tiers, enemy.tier, key=lambda t: -t)
+        tier_run.insert(enemy)
+
+    def find(self, priority, pos, radius, sees_camo):
+        """Best valid target for "first", "last" or "strong", honouring camo and the overkill filter; None if nothing qualifies."""
+        def valid(e): return e.is_active and ("camo" not in e.properties or sees_camo) and e.tier - e.incoming_damage_tiers > 0 and pos.distance_to(e.pos) <= radius
+        if priority == "strong":
+            by_path_tier = self._path_tiers()
+            for tier in self.tiers:
+                best = None
+                for path, tier_runs in by_path_tier.items():
+                    run = tier_runs.get(tier)
+                    if run is None: continue
+                    for lo, hi in coverage_intervals(pos.x, pos.y, radius, path):
+                        for i in range(bisect_left(run.keys, (-hi,)), bisect_right(run.keys, (-lo, math.inf))):
+                            e = run.enemies[i]
+                            if e.tier == tier and (best is None or e.uid < best.uid) and valid(e): best = e
+                if best is not None: return best
+            return None
+        best, best_key = None, None
+        for path, run in self._paths().items():
+            keys, enemies = run.keys, run.enemies
+            intervals = coverage_intervals(pos.x, pos.y, radius, path)
+            if priority == "first":
+                for lo, hi in reversed(intervals): # Furthest interval first; the first valid hit is this path's answer
+                    found = next((enemies[i] for i in range(bisect_left(keys, (-hi,)), bisect_right(keys, (-lo, math.inf))) if valid(enemies[i])), None)
+                    if found is not None:
+                        key = (-found.distance_travelled, found.uid)
+                        if best_key is None or key < best_key: best, best_key = found, key
+                        break
+            else: # "last": scan backwards from the least-travelled end; among equal distances the lowest uid wins
+                for lo, hi in intervals:
+                    found = None
+                    for i in range(bisect_right(keys, (-lo, math.inf)) - 1, bisect_left(keys, (-hi,)) - 1, -1):
+                        e = enemies[i]
+                        if found is not None and keys[i][0] != keys[found_i][0]: break
+                        if valid(e): found, found_i = e, i
+                    if found is not None:
+                        key = (found.distance_travelled, found.uid)
+                        if best_key is None or key < best_key: best, best_key = found, key
+                        break
+        return best
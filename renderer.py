@@ -1,14 +1,31 @@
 # renderer.py
-import pygame, re, math
+import pygame, os, hashlib, threading
+from operator import attrgetter
 from assets import DOG_TOWERS, GEOMETRIC_ENEMIES, MAPS, ROUND_COMPOSITIONS, UI_ICONS, UI_ASSETS, MAP_DECORATIONS
 from utilities import COLOR_PALETTES, SCREEN_HEIGHT, SCREEN_WIDTH, PLAYABLE_WIDTH
+from text_cache import text_cache
+from profiler import profiler
+from sprite_atlas import ATLAS_VERSION, sprite_parts, render_sprite, warm_in_background
+from visual_effects import EffectRenderer
+
+MAP_LAYER_VERSION = 1 # Bump when _render_map_layer changes, so stale map_cache files are rebuilt
 
 class Renderer:
-    def __init__(self, screen):
+    def __init__(self, screen, map_cache_dir=None, atlas_dir=None):
         self.screen = screen
         self._font_cache = {}
         self._shape_cache = {}
         self._map_previews = {}
+        self.map_cache_dir = map_cache_dir # Optional on-disk cache of prerendered map layers
+        self._map_layer, self._map_layer_source = None, None
+        self._anchor_rect = pygame.Rect(0, 0, 0, 0) # Rounds a float position the same way Rect.center does
+        self._playable_rect = pygame.Rect(0, 0, PLAYABLE_WIDTH, SCREEN_HEIGHT) # Sprites entirely outside it are culled
+        self._projectile_sprite = pygame.Surface((9, 9), pygame.SRCALPHA); pygame.draw.circle(self._projectile_sprite, (255, 255, 0), (4, 4), 4)
+        if pygame.display.get_surface(): self._projectile_sprite = self._projectile_sprite.convert_alpha()
+        self._projectile_anchor = (4, 4)
+        self._effect_renderer = EffectRenderer((PLAYABLE_WIDTH, SCREEN_HEIGHT))
+        self._atlas = None
+        if atlas_dir: warm_in_background(atlas_dir, self._set_atlas) # Loaded (or built, if missing or stale) off the startup path
 
     def get_font(self, size, bold=False):
         key = (size, bold)
@@ -17,7 +34,7 @@ class Renderer:
 
     def draw_text(self, text, x, y, color, size, bold=False, align="center"):
         font = self.get_font(size, bold)
-        text_surface = font.render(text, True, color)
+        text_surface = text_cache.render(font, text, color)
         text_rect = text_surface.get_rect()
         if align == "center": text_rect.center = (x, y)
         elif align == "left": text_rect.midleft = (x, y)
@@ -38,38 +55,45 @@ class Renderer:
             else: button.draw(self.screen)
             
     def draw_game_state(self, game_engine, ui_manager):
-        self._draw_map(game_engine.map_data)
-        if ui_manager.placing_tower_type: self._draw_placement_preview(ui_manager, game_engine)
-        if ui_manager.selected_tower: self._draw_range_circle(ui_manager.selected_tower)
-        
-        for tower in game_engine.towers: self._draw_asset(tower, DOG_TOWERS, scale=1.2)
-        for enemy in game_engine.enemies: self._draw_asset(enemy, GEOMETRIC_ENEMIES)
-        for proj in game_engine.projectiles: pygame.draw.circle(self.screen, (255, 255, 0), proj.pos, 4)
+        with profiler.section("render.map"):
+            self._draw_map(game_engine.map_data)
+            if ui_manager.placing_tower_type: self._draw_placement_preview(ui_manager, game_engine)
+            if ui_manager.selected_tower: self._draw_range_circle(ui_manager.selected_tower)
         
-        for effect in game_engine.visual_effects:
-            if effect.type == "line_trail":
-                alpha = max(0, min(255, int(255 * (effect.lifetime / 0.1)))); start, end = effect.start_pos, effect.end_pos
-                line_rect = pygame.Rect(min(start.x, end.x), min(start.y, end.y), abs(start.x-end.x)+1, abs(start.y-end.y)+1)
-                line_surf = pygame.Surface(line_rect.size, pygame.SRCALPHA); pygame.draw.line(line_surf, (255,255,255,alpha), (start.x-line_rect.x, start.y-line_rect.y), (end.x-line_rect.x, end.y-line_rect.y), 3); self.screen.blit(line_surf, line_rect)
+        with profiler.section("render.towers"): self._blit_layer(game_engine.towers, DOG_TOWERS, 1.2, lambda t: t.tower_id, lambda t: tuple(t.upgrades))
+        with profiler.section("render.enemies"):
+            self._blit_layer(game_engine.enemies, GEOMETRIC_ENEMIES, 1.0, attrgetter('enemy_id'))
+            for enemy in game_engine.enemies:
+                if enemy.stack_count > 1 and self._playable_rect.collidepoint(enemy.pos): self.draw_text(f"x{enemy.stack_count}", enemy.pos.x + 14, enemy.pos.y - 14, (255, 255, 255), 12, True, "left") # Co-located identical shapes drawn once
+        with profiler.section("render.effects"):
+            sprite, (ax, ay), (w, h) = self._projectile_sprite, self._projectile_anchor, self._projectile_sprite.get_size()
+            self.screen.blits([(sprite, (x, y)) for x, y in ((round(p.pos.x) - ax, round(p.pos.y) - ay) for p in game_engine.projectiles)
+                               if -w < x < PLAYABLE_WIDTH and -h < y < SCREEN_HEIGHT], False)
+            self._effect_renderer.draw(self.screen, game_engine.visual_effects)
 
-        self._draw_hud(game_engine, ui_manager)
-        
-        side_panel_clip = pygame.Rect(1150, 50, 130, SCREEN_HEIGHT-50)
-        for button in ui_manager.buttons:
-            if button.id.startswith("buy_"):
-                if button.rect.colliderect(side_panel_clip):
-                    original_clip = self.screen.get_clip(); self.screen.set_clip(side_panel_clip); button.draw(self.screen)
-                    tower_id = button.id.split('_', 1)[1]; dummy_tower = type('obj', (object,), {'tower_id': tower_id, 'upgrades': [0,0,0]})
-                    self._draw_asset(dummy_tower, DOG_TOWERS, scale=0.9, pos_override=(button.rect.centerx, button.rect.y+35))
-                    self.draw_text(f"${DOG_TOWERS[tower_id]['cost']}", button.rect.centerx, button.rect.bottom - 15, (255,255,255), 14, True, "center")
-                    self.draw_text(DOG_TOWERS[tower_id]['name'], button.rect.centerx, button.rect.bottom - 30, (255,255,255), 10, "center")
-                    self.screen.set_clip(original_clip)
-            elif button.is_active or (button.id.startswith("upgrade_") and ui_manager.selected_tower): 
-                button.draw(self.screen)
+        with profiler.section("render.hud"): self._draw_hud(game_engine, ui_manager)
         
-        for button in ui_manager.buttons:
-            if button.id == "fast_forward" and button.is_active: self._draw_asset(type('obj',(object,),{'enemy_id':'fast_forward','upgrades':(0,0,0)})(), UI_ICONS, pos_override=button.rect.center, scale=0.8)
-            elif button.id == "cancel_placement" and button.is_active: self._draw_asset(type('obj',(object,),{'enemy_id':'garbage_can','upgrades':(0,0,0)})(), UI_ICONS, pos_override=button.rect.center, scale=1.0)
+        with profiler.section("render.buttons"):
+            side_panel_clip = pygame.Rect(1150, 50, 130, SCREEN_HEIGHT-50)
+            for button in ui_manager.buttons:
+                if button.id.startswith("buy_"):
+                    if button.rect.colliderect(side_panel_clip):
+                        original_clip = self.screen.get_clip(); self.screen.set_clip(side_panel_clip); button.draw(self.screen)
+                        tower_id = button.id.split('_', 1)[1]; self._draw_sprite(tower_id, DOG_TOWERS, (button.rect.centerx, button.rect.y+35), scale=0.9)
+                        self.draw_text(f"${DOG_TOWERS[tower_id]['cost']}", button.rect.centerx, button.rect.bottom - 15, (255,255,255), 14, True, "center")
+                        self.draw_text(DOG_TOWERS[tower_id]['name'], button.rect.centerx, button.rect.bottom - 30, (255,255,255), 10, "center")
+                        self.screen.set_clip(original_clip)
+                elif button.is_active or (button.id.startswith("upgrade_") and ui_manager.selected_tower): 
+                    button.draw(self.screen)
+
+            for button in ui_manager.buttons:
+                if button.id == "fast_forward" and button.is_active:
+                    speed = ui_manager.game.game_speed
+                    if speed == 1.0: self._draw_sprite('fast_forward', UI_ICONS, button.rect.center, scale=0.8)
+                    else: # Current multiplier under a smaller icon
+                        self._draw_sprite('fast_forward', UI_ICONS, (button.rect.centerx, button.rect.centery - 7), scale=0.6)
+                        self.draw_text("MAX" if speed is None else f"{speed:g}x", button.rect.centerx, button.rect.bottom - 11, (255, 255, 255), 13, True, "center")
+                elif button.id == "cancel_placement" and button.is_active: self._draw_sprite('garbage_can', UI_ICONS, button.rect.center, scale=1.0)
                 
     def draw_pause_menu(self, ui_manager):
         overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
@@ -85,36 +109,82 @@ class Renderer:
         self.draw_text("Settings", SCREEN_WIDTH//2, 150, (255,255,255), 64, True, "center")
         for slider in ui_manager.sliders: slider.draw(self.screen, self)
         for button in ui_manager.buttons: button.draw(self.screen)
+
+    def draw_profiler_overlay(self, profiler, sound_stats=None, text_stats=None):
+        # F3 overlay: rolling p50/p99 per profiled section, indented by nesting; F4 exports the buffer as a trace
+        stats = profiler.stats(); line_height, x, y = 16, 10, 60; rows = max(1, len(stats)) + (1 if sound_stats else 0) + (1 if text_stats else 0)
+        panel = pygame.Surface((330, 28 + line_height * rows), pygame.SRCALPHA); panel.fill((0, 0, 0, 170)); self.screen.blit(panel, (x - 5, y - 5))
+        self.draw_text("Frame profiler (F4: save trace)    p50 / p99 ms", x, y + 6, (255, 255, 0), 14, True, "left")
+        for i, (name, depth, p50, p99) in enumerate(stats):
+            row_y = y + 6 + line_height * (i + 1)
+            self.draw_text(name, x + 12 * depth, row_y, (255, 255, 255), 13, False, "left")
+            self.draw_text(f"{p50:6.2f} / {p99:6.2f}", x + 310, row_y, (255, 255, 255), 13, False, "right")
+        if sound_stats:
+            self.draw_text("sounds played {played} / coalesced {coalesced} / dropped {dropped}".format(**sound_stats), x, y + 6 + line_height * (max(1, len(stats)) + 1), (180, 220, 255), 13, False, "left")
+        if text_stats:
+            self.draw_text("text renders {misses} / cached {hits}, wraps {layout_misses} / cached {layout_hits}".format(**text_stats), x, y + 6 + line_height * rows, (180, 220, 255), 13, False, "left")
                 
     def _draw_map(self, map_data):
+        # Terrain, water, paths and decorations never change during a game: prerender once, then one blit per frame
+        if map_data is not self._map_layer_source: self._map_layer, self._map_layer_source = self._load_map_layer(map_data), map_data
+        self.screen.blit(self._map_layer, (0, 0))
+
+    def _load_map_layer(self, map_data):
         theme = COLOR_PALETTES['map_themes'][map_data['theme']]
-        self.screen.fill(COLOR_PALETTES['default']['background'])
-        pygame.draw.rect(self.screen, theme['background'], (0, 0, PLAYABLE_WIDTH, SCREEN_HEIGHT))
+        cache_path = None
+        if self.map_cache_dir:
+            # Everything the layer is drawn from, including the decorations' SVG data and the rasterizer versions
+            decorations = {decoration_id: MAP_DECORATIONS[decoration_id] for decoration_id in map_data.get("decorations", {})}
+            key = (MAP_LAYER_VERSION, ATLAS_VERSION, map_data, decorations, theme, COLOR_PALETTES['default']['background'], self.screen.get_size())
+            digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+            cache_path = os.path.join(self.map_cache_dir, f"map_{digest}.png")
+            if os.path.exists(cache_path):
+                try:
+                    layer = pygame.image.load(cache_path)
+                    return layer.convert() if pygame.display.get_surface() else layer
+                except pygame.error: pass # Unreadable cache file; rebuild it below
+        layer = self._render_map_layer(map_data, theme)
+        if cache_path:
+            try: os.makedirs(self.map_cache_dir, exist_ok=True); pygame.image.save(layer, cache_path)
+            except (OSError, pygame.error) as e: print(f"Warning: Could not write map cache '{cache_path}': {e}")
+        return layer.convert() if pygame.display.get_surface() else layer
+
+    def _render_map_layer(self, map_data, theme):
+        layer = pygame.Surface(self.screen.get_size())
+        layer.fill(COLOR_PALETTES['default']['background'])
+        pygame.draw.rect(layer, theme['background'], (0, 0, PLAYABLE_WIDTH, SCREEN_HEIGHT))
         for decoration_id, positions in map_data.get("decorations", {}).items():
-            for pos in positions: self._draw_asset(type('obj',(object,),{'enemy_id':decoration_id,'upgrades':(0,0,0)})(), MAP_DECORATIONS, pos_override=pos)
+            for pos in positions: self._draw_sprite(decoration_id, MAP_DECORATIONS, pos, target=layer)
         for area in map_data.get("water_areas", []):
             color = theme.get('lava') if area.get('is_lava') else theme['water']
-            if area['shape'] == 'rect': pygame.draw.rect(self.screen, color, (area['x'], area['y'], area['width'], area['height']))
-            elif area['shape'] == 'circle': pygame.draw.circle(self.screen, color, (area['cx'], area['cy']), area['r'])
+            if area['shape'] == 'rect': pygame.draw.rect(layer, color, (area['x'], area['y'], area['width'], area['height']))
+            elif area['shape'] == 'circle': pygame.draw.circle(layer, color, (area['cx'], area['cy']), area['r'])
         paths = [p for k, p in map_data.items() if k.startswith('path')]
         for path in paths:
-            if len(path) > 1: path_color=theme['path']; border_color=tuple(max(0,c-20) for c in path_color); pygame.draw.lines(self.screen, border_color, False, path, width=84); pygame.draw.lines(self.screen, path_color, False, path, width=80)
+            if len(path) > 1: path_color=theme['path']; border_color=tuple(max(0,c-20) for c in path_color); pygame.draw.lines(layer, border_color, False, path, width=84); pygame.draw.lines(layer, path_color, False, path, width=80)
+        return layer
     
     def _get_map_preview(self, map_id):
+        # Drawn on a background thread the first time a map is shown; until then the card is just the theme's background
         if map_id not in self._map_previews:
-            map_data, preview_surface = MAPS[map_id], pygame.Surface((200, 100)); theme = COLOR_PALETTES['map_themes'][map_data['theme']]
-            preview_surface.fill(theme['background']); scale_x, scale_y = 200/PLAYABLE_WIDTH, 100/SCREEN_HEIGHT
-            paths = [p for k, p in map_data.items() if k.startswith('path')]
-            for path in paths:
-                if len(path)>1: pygame.draw.lines(preview_surface, theme['path'], False, [(p[0]*scale_x,p[1]*scale_y) for p in path], width=8)
-            self._map_previews[map_id] = preview_surface
+            map_data = MAPS[map_id]; placeholder = pygame.Surface((200, 100)); placeholder.fill(COLOR_PALETTES['map_themes'][map_data['theme']]['background'])
+            self._map_previews[map_id] = placeholder
+            threading.Thread(target=self._build_map_preview, args=(map_id,), name=f"preview-{map_id}", daemon=True).start()
         return self._map_previews[map_id]
 
+    def _build_map_preview(self, map_id):
+        map_data, preview_surface = MAPS[map_id], pygame.Surface((200, 100)); theme = COLOR_PALETTES['map_themes'][map_data['theme']]
+        preview_surface.fill(theme['background']); scale_x, scale_y = 200/PLAYABLE_WIDTH, 100/SCREEN_HEIGHT
+        paths = [p for k, p in map_data.items() if k.startswith('path')]
+        for path in paths:
+            if len(path)>1: pygame.draw.lines(preview_surface, theme['path'], False, [(p[0]*scale_x,p[1]*scale_y) for p in path], width=8)
+        self._map_previews[map_id] = preview_surface
+
     def _draw_hud(self, game_engine, ui_manager):
-        self._draw_asset(type('obj',(object,),{'tower_id':'side_panel_bg','upgrades':(0,0,0)})(), UI_ASSETS, pos_override=(1150,0))
-        if ui_manager.selected_tower: self._draw_asset(type('obj',(object,),{'tower_id':'upgrade_panel_bg','upgrades':(0,0,0)})(), UI_ASSETS, pos_override=(10,470))
+        self._draw_sprite('side_panel_bg', UI_ASSETS, (1150,0))
+        if ui_manager.selected_tower: self._draw_sprite('upgrade_panel_bg', UI_ASSETS, (10,470))
         pygame.draw.rect(self.screen, COLOR_PALETTES['default']['panel_background'], (0,0,SCREEN_WIDTH,50))
-        self._draw_asset(type('obj',(object,),{'enemy_id':'heart','upgrades':(0,0,0)})(), UI_ICONS, pos_override=(190,25), scale=0.7)
+        self._draw_sprite('heart', UI_ICONS, (190,25), scale=0.7)
         self.draw_text(f"{game_engine.lives}", 220, 25, COLOR_PALETTES['default']['primary_text'], 24, True, "left")
         self.draw_text(f"$ {game_engine.money}", 20, 25, COLOR_PALETTES['default']['success'], 24, True, "left")
         self.draw_text(f"Round: {game_engine.current_round}", SCREEN_WIDTH-20, 25, COLOR_PALETTES['default']['primary_text'], 24, True, "right")
@@ -124,88 +194,51 @@ class Renderer:
             self.draw_text(f"Pops: {tower.pop_count}", 115, 515, COLOR_PALETTES['default']['secondary_text'], 16, align="center")
             self._draw_asset(tower, DOG_TOWERS, scale=2.0, pos_override=(115, 580))
             
-    def _draw_asset(self, entity, asset_dict, scale=1.0, pos_override=None):
-        entity_id=entity.tower_id if hasattr(entity,'tower_id') else entity.enemy_id; pos=pos_override or entity.pos; upgrades_tuple=tuple(entity.upgrades) if hasattr(entity,'upgrades') else (0,0,0); cache_key=(entity_id,scale,upgrades_tuple)
-        if cache_key not in self._shape_cache:
-            asset_data, svg_data_root = asset_dict[entity_id], asset_dict[entity_id].get('svg_params') or asset_dict[entity_id].get('svg')
-            if not svg_data_root: return
-            all_svg_parts = dict(svg_data_root)
-            if hasattr(entity, 'upgrades'):
-                for path_index, tier in enumerate(entity.upgrades):
-                    for i in range(1, tier + 1):
-                        if f"{path_index+1}_{i}" in asset_data.get("upgrade_svgs", {}): all_svg_parts.update(asset_data["upgrade_svgs"][f"{path_index+1}_{i}"])
-            all_points_str=re.findall(r"-?\d+\.?\d*", str(all_svg_parts)); coords=[abs(float(p)) for p in all_points_str] if all_points_str else [30]
-            max_dim=int(max(coords)*2.5*scale) if coords else int(60*scale); size=(max_dim, max_dim)
-            asset_surface=pygame.Surface(size,pygame.SRCALPHA); center=pygame.Vector2(size[0]//2,size[1]//2)
-            if 'shape' in all_svg_parts: self._draw_svg_shape(asset_surface, all_svg_parts, center, scale)
-            else:
-                for part_name in sorted(all_svg_parts.keys()): self._draw_svg_shape(asset_surface, all_svg_parts[part_name], center, scale)
-            self._shape_cache[cache_key]=asset_surface
-        cached_surface=self._shape_cache[cache_key]; draw_rect=cached_surface.get_rect(center=pos); self.screen.blit(cached_surface,draw_rect)
-        
-    def _draw_svg_shape(self, surface, params, offset, scale):
-        color, stroke_color=params.get('fill'), params.get('stroke'); stroke_width=int(params.get('stroke_width',1)*scale) if params.get('stroke_width',1)>0 else 0
-        def scale_pt(pt, off): return (pt[0]*scale + off.x, pt[1]*scale + off.y)
-        shape_type = params.get('shape')
-        if not shape_type: return
-        if shape_type == 'polygon':
-            points_list = [float(p) for p in params['points'].replace(",", " ").split()]; points=[scale_pt((points_list[i], points_list[i+1]), offset) for i in range(0,len(points_list),2)]
-            if color: pygame.draw.polygon(surface, color, points)
-            if stroke_color and stroke_width > 0: pygame.draw.polygon(surface, stroke_color, points, stroke_width)
-        elif shape_type == 'circle':
-            pos, radius = (params.get('cx',0)*scale+offset.x, params.get('cy',0)*scale+offset.y), int(params.get('r',0)*scale)
-            if radius > 0:
-                if color: pygame.draw.circle(surface, color, pos, radius)
-                if stroke_color and stroke_width > 0: pygame.draw.circle(surface, stroke_color, pos, radius, stroke_width)
-        elif shape_type == 'rect':
-             rect = pygame.Rect(params['x']*scale+offset.x, params['y']*scale+offset.y, params['width']*scale, params['height']*scale)
-             if color: pygame.draw.rect(surface, color, rect)
-             if stroke_color and stroke_width > 0: pygame.draw.rect(surface, stroke_color, rect, stroke_width)
-        elif shape_type == 'path':
-            for subpath in self._parse_svg_path(params.get('d',"")):
-                scaled_points = [scale_pt(p, offset) for p in subpath['points']]
-                if len(scaled_points)>1:
-                    is_closed = subpath['closed']
-                    if len(scaled_points)>2 and is_closed and color: pygame.draw.polygon(surface, color, scaled_points)
-                    if stroke_color and stroke_width > 0: pygame.draw.lines(surface, stroke_color, is_closed, scaled_points, stroke_width)
-    
-    def _parse_svg_path(self, path_string, steps=15):
-        tokens=re.findall(r"([MmLlHhVvCcSsQqTtAaZz])|(-?\d+(?:\.\d+)?)",path_string); subpaths,current_subpath,i=[],None,0; current_pos,path_start=pygame.Vector2(0,0),pygame.Vector2(0,0)
-        while i<len(tokens):
-            cmd_char=tokens[i][0]; i+=1;
-            if not cmd_char: continue
-            is_relative=cmd_char.islower(); cmd_type=cmd_char.lower()
-            def get_params(count):
-                nonlocal i; params=[]
-                while len(params)<count and i<len(tokens) and not tokens[i][0]:params.append(float(tokens[i][1])); i+=1
-                return params
-            implicit_cmd='l' if cmd_type=='m' else cmd_type
-            while True:
-                params=get_params({'m':2,'l':2,'h':1,'v':1,'c':6,'q':4,'s':4,'t':2,'z':0}.get(cmd_type,0))
-                if not params and cmd_type not in 'z': break
-                if cmd_type=='m':
-                    if current_subpath:subpaths.append(current_subpath)
-                    current_subpath={'points':[],'closed':False}; current_pos=current_pos+params if is_relative else pygame.Vector2(params); path_start=current_pos; current_subpath['points'].append(path_start)
-                elif cmd_type=='l': current_pos=current_pos+params if is_relative else pygame.Vector2(params); current_subpath['points'].append(current_pos)
-                elif cmd_type=='h': current_pos.x=current_pos.x+params[0] if is_relative else params[0]; current_subpath['points'].append(current_pos.copy())
-                elif cmd_type=='v': current_pos.y=current_pos.y+params[0] if is_relative else params[0]; current_subpath['points'].append(current_pos.copy())
-                elif cmd_type=='c':
-                    p1,p2,p3=(current_pos+params[0:2] if is_relative else pygame.Vector2(params[0:2])),(current_pos+params[2:4] if is_relative else pygame.Vector2(params[2:4])),(current_pos+params[4:6] if is_relative else pygame.Vector2(params[4:6]))
-                    for t in[i/steps for i in range(1,steps+1)]:omt=1-t;current_subpath['points'].append((omt**3*current_pos)+(3*omt**2*t*p1)+(3*omt*t**2*p2)+(t**3*p3))
-                    current_pos=p3
-                elif cmd_type=='q':
-                    p1,p2=(current_pos+params[0:2] if is_relative else pygame.Vector2(params[0:2])),(current_pos+params[2:4] if is_relative else pygame.Vector2(params[2:4]))
-                    for t in[i/steps for i in range(1,steps+1)]:omt=1-t;current_subpath['points'].append((omt**2*current_pos)+(2*omt*t*p1)+(t**2*p2))
-                    current_pos=p2
-                elif cmd_type=='z':
-                    if current_subpath:current_subpath['closed']=True
-                cmd_type=implicit_cmd
-                if i>=len(tokens) or tokens[i][0]:break
-        if current_subpath:subpaths.append(current_subpath)
-        return subpaths
-        
+    def _draw_asset(self, entity, asset_dict, scale=1.0, pos_override=None, target=None):
+        entity_id = entity.tower_id if hasattr(entity,'tower_id') else entity.enemy_id
+        self._draw_sprite(entity_id, asset_dict, pos_override or entity.pos, scale, tuple(entity.upgrades) if hasattr(entity,'upgrades') else (0,0,0), target)
+
+    def _draw_sprite(self, entity_id, asset_dict, pos, scale=1.0, upgrades=(0,0,0), target=None):
+        surface, anchor = self._sprite(entity_id, asset_dict, scale, upgrades)
+        if surface is None: return
+        self._anchor_rect.center = pos; (target or self.screen).blit(surface, (self._anchor_rect.x - anchor[0], self._anchor_rect.y - anchor[1]))
+
+    def _sprite(self, entity_id, asset_dict, scale=1.0, upgrades=(0,0,0)):
+        cache_key = (entity_id, scale, upgrades); sprite = self._shape_cache.get(cache_key)
+        if sprite is None: sprite = self._shape_cache[cache_key] = self._build_sprite(cache_key, asset_dict[entity_id], upgrades, scale)
+        return sprite
+
+    def _blit_layer(self, entities, asset_dict, scale, get_id, get_upgrades=None):
+        # One Surface.blits call per layer; sprites entirely outside the playable area are culled. Sprites are resolved
+        # once per distinct (id, upgrades) in the layer, and runs of the same sprite skip even that dict lookup
+        batch, sprites, anchor_rect, right, bottom = [], {}, self._anchor_rect, self._playable_rect.right, self._playable_rect.bottom
+        append, last_key, sprite = batch.append, None, None
+        for entity in entities:
+            key = (get_id(entity), get_upgrades(entity)) if get_upgrades else get_id(entity)
+            if key != last_key:
+                last_key, sprite = key, sprites.get(key, False)
+                if sprite is False:
+                    surface, anchor = self._sprite(key[0], asset_dict, scale, key[1]) if get_upgrades else self._sprite(key, asset_dict, scale)
+                    sprite = sprites[key] = (surface, anchor[0], anchor[1], surface.get_width(), surface.get_height()) if surface is not None else None
+            if sprite is None: continue
+            anchor_rect.center = entity.pos; x, y = anchor_rect.x - sprite[1], anchor_rect.y - sprite[2]
+            if x < right and y < bottom and x + sprite[3] > 0 and y + sprite[4] > 0: append((sprite[0], (x, y)))
+        self.screen.blits(batch, False)
+
+    def _build_sprite(self, cache_key, asset_data, upgrades, scale):
+        # Prefer the prebaked atlas; only sprites it doesn't know (or that are needed before it is ready) are rasterized here
+        sprite = self._atlas.get(cache_key) if self._atlas else None
+        if sprite is None:
+            parts = sprite_parts(asset_data, upgrades)
+            sprite = render_sprite(parts, scale) if parts else (None, None)
+        surface, anchor = sprite
+        if surface is not None and pygame.display.get_surface(): surface = surface.convert_alpha()
+        return surface, anchor
+
+    def _set_atlas(self, sprites): self._atlas = sprites
+
     def _draw_range_circle(self,tower):
-        radius=int(tower.get_stat('range'));s=pygame.Surface((radius*2,radius*2),pygame.SRCALPHA);pygame.draw.circle(s,(100,100,100,80),(radius,radius),radius);pygame.draw.circle(s,(255,255,255,120),(radius,radius),radius,2);self.screen.blit(s,(tower.x-radius,tower.y-radius))
+        radius=int(tower.stats.range);s=pygame.Surface((radius*2,radius*2),pygame.SRCALPHA);pygame.draw.circle(s,(100,100,100,80),(radius,radius),radius);pygame.draw.circle(s,(255,255,255,120),(radius,radius),radius,2);self.screen.blit(s,(tower.x-radius,tower.y-radius))
     
     def _draw_placement_preview(self,ui_manager,game_engine):
-        pos,tower_id=ui_manager.mouse_pos,ui_manager.placing_tower_type;dummy_tower=type('obj',(object,),{'tower_id':tower_id,'upgrades':[0,0,0]});self._draw_asset(dummy_tower,DOG_TOWERS,scale=1.2,pos_override=pos);radius=DOG_TOWERS[tower_id]['base_stats']['range'];s=pygame.Surface((radius*2,radius*2),pygame.SRCALPHA);is_valid=game_engine.is_valid_placement(tower_id,pos);color=(100,255,100,60) if is_valid else (255,100,100,60);pygame.draw.circle(s,color,(radius,radius),radius);pygame.draw.circle(s,(255,255,255,100),(radius,radius),radius,2);self.screen.blit(s,(pos[0]-radius,pos[1]-radius))
+        pos,tower_id=ui_manager.mouse_pos,ui_manager.placing_tower_type;self._draw_sprite(tower_id,DOG_TOWERS,pos,scale=1.2);radius=DOG_TOWERS[tower_id]['base_stats']['range'];s=pygame.Surface((radius*2,radius*2),pygame.SRCALPHA);is_valid=game_engine.is_valid_placement(tower_id,pos);color=(100,255,100,60) if is_valid else (255,100,100,60);pygame.draw.circle(s,color,(radius,radius),radius);pygame.draw.circle(s,(255,255,255,100),(radius,radius),radius,2);self.screen.blit(s,(pos[0]-radius,pos[1]-radius))
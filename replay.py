@@ -0,0 +1,81 @@
+# replay.py
+# Deterministic input logs: every player action against GameEngine is stored with the tick it happened before, along with
+# every tick's dt and state checksums, so a session can be re-simulated headlessly at full speed and checked for desyncs.
+import gzip, json, time, zlib
+from simulation import HeadlessGame
+
+REPLAY_VERSION = 1
+
+def tick_checksum(engine):
+    """Cheap 16-bit fingerprint of the scalar game state, taken after every tick."""
+    return zlib.crc32(f"{engine.money},{engine.lives},{engine.current_round},{engine.enemy_count()},{len(engine.projectiles)}".encode()) & 0xffff
+
+def round_checksum(engine):
+    """Full fingerprint at the end of a round: economy, lives and every tower's build, targeting and pops."""
+    towers = [(t.tower_id, t.x, t.y, tuple(t.upgrades), t.targeting_priority, t.pop_count) for t in engine.towers]
+    return zlib.crc32(repr((engine.current_round, engine.money, engine.lives, towers)).encode())
+
+def _open(path, mode): return gzip.open(path, mode + 't') if path.endswith('.gz') else open(path, mode)
+
+class InputRecorder:
+    """Attached to GameEngine.recorder for one game; the engine reports actions, ticks and round ends to it.
+    With a path, the log is rewritten at every round end so a crash still leaves a usable replay."""
+    def __init__(self, map_id, difficulty, path=None):
+        self.map_id, self.difficulty, self.path = map_id, difficulty, path
+        self.dts, self.tick_checks, self.actions, self.round_checks = [], [], [], {}
+
+    def action(self, engine, name, *args): self.actions.append([engine.tick, name, *args])
+    def on_tick(self, engine, dt): self.dts.append(dt); self.tick_checks.append(f"{tick_checksum(engine):04x}")
+    def on_round_end(self, engine):
+        self.round_checks[str(engine.current_round)] = [engine.tick, round_checksum(engine)]
+        if self.path: self.save()
+
+    def save(self, path=None):
+        path = path or self.path
+        data = {"version": REPLAY_VERSION, "map_id": self.map_id, "difficulty": self.difficulty, "dts": self.dts,
+                "tick_checks": "".join(self.tick_checks), "actions": self.actions, "round_checks": self.round_checks}
+        with _open(path, 'w') as f: json.dump(data, f, separators=(',', ':'))
+
+def load_replay(path):
+    with _open(path, 'r') as f: data = json.load(f)
+    if data.get("version") != REPLAY_VERSION: raise ValueError(f"Unsupported replay version {data.get('version')} in '{path}'")
+    return data
+
+def apply_action(engine, name, *args):
+    """Re-issues one recorded action; towers are addressed by their index in engine.towers at the time of the action."""
+    if name == "place_tower": engine.place_tower(args[0], tuple(args[1]))
+    elif name == "upgrade_tower": engine.upgrade_tower(engine.towers[args[0]], args[1])
+    elif name == "sell_tower": engine.sell_tower(engine.towers[args[0]])
+    elif name == "start_next_round": engine.start_next_round()
+    elif name == "set_targeting": engine.set_targeting(engine.towers[args[0]], args[1])
+    elif name == "set_auto_start": engine.set_auto_start(args[0])
+    elif name == "set_game_speed": pass # Informational: speed only changes how many fixed ticks run per rendered frame
+    else: raise ValueError(f"Unknown replay action '{name}'")
+
+def replay(data, use_enemy_store=False):
+    """Re-simulates a recorded game as fast as possible under a fresh recorder and compares the two logs.
+    Returns the first divergent tick (1-based) and round, each None when they match."""
+    game = HeadlessGame(data["map_id"], data["difficulty"], use_enemy_store); engine = game.game_engine
+    engine.start_new_game(data["map_id"], data["difficulty"]); engine.recorder = check = InputRecorder(data["map_id"], data["difficulty"])
+    actions, next_action, error, start = data["actions"], 0, None, time.perf_counter()
+    try:
+        for tick, dt in enumerate(data["dts"]):
+            while next_action < len(actions) and actions[next_action][0] <= tick: apply_action(engine, *actions[next_action][1:]); next_action += 1
+            engine.update(dt)
+    except IndexError: error = f"action {next_action} {actions[next_action][1:]} names a tower that doesn't exist" # Only happens after a desync
+    wall_time, recorded_ticks = time.perf_counter() - start, data["tick_checks"]
+    first_bad_tick = next((i + 1 for i, c in enumerate(check.tick_checks) if c != recorded_ticks[i*4:i*4+4]), None)
+    if first_bad_tick is None and error: first_bad_tick = len(check.tick_checks) + 1
+    first_bad_round = next((int(r) for r, c in sorted(data["round_checks"].items(), key=lambda item: item[1][0]) if check.round_checks.get(r) != c), None)
+    return {"ticks": len(data["dts"]), "rounds": engine.current_round, "actions": next_action, "wall_time": wall_time,
+            "first_divergent_tick": first_bad_tick, "first_divergent_round": first_bad_round, "error": error, "money": engine.money, "lives": engine.lives}
+
+def run_replay(args):
+    """Entry point for `main.py --replay`; returns a process exit code (1 if the replay diverged)."""
+    result = replay(load_replay(args.replay), use_enemy_store=args.enemy_store)
+    print(f"Replayed {result['ticks']} ticks ({result['rounds']} rounds, {result['actions']} actions) in {result['wall_time']:.2f}s | "
+          f"money {result['money']} | lives {result['lives']}")
+    if result['first_divergent_tick'] is None and result['first_divergent_round'] is None: print("OK: replay matches the recording"); return 0
+    print(f"DESYNC: first divergent tick {result['first_divergent_tick']}, first divergent round {result['first_divergent_round']}")
+    if result['error']: print(f"Replay stopped: {result['error']}")
+    return 1
@@ -0,0 +1,52 @@
+# save_writer.py
+# Background save I/O: the main loop hands over a plain dict and returns immediately; one writer thread encodes it as
+# compact JSON into a temp file next to the target and os.replace()s it over the old save, so a crash mid-write
+# leaves the previous save intact instead of a truncated file.
+import json, os, queue, threading
+
+class SaveWriter:
+    """Writes and deletes run on the writer thread in the order they were requested."""
+    def __init__(self):
+        self.queue, self.thread, self.lock = queue.Queue(), None, threading.Lock()
+        self.pending, self.latest = {}, {} # Per path: queued operations not yet finished, and the most recently requested one
+        self.writes = self.errors = 0
+
+    def _start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name="save-writer", daemon=True); self.thread.start()
+
+    def _submit(self, op, path, data):
+        with self.lock: self.pending[path], self.latest[path] = self.pending.get(path, 0) + 1, op
+        self.queue.put((op, path, data)); self._start()
+
+    def write(self, path, data):
+        """Queues `data` (which the caller must no longer mutate) to be saved as `path`."""
+        self._submit("write", path, data)
+
+    def delete(self, path): self._submit("delete", path, None)
+
+    def exists(self, path):
+        """Whether `path` will exist once the queued operations have run."""
+        with self.lock:
+            if self.pending.get(path): return self.latest[path] == "write"
+        return os.path.exists(path)
+
+    def flush(self):
+        """Blocks until every queued write and delete has finished."""
+        if self.thread is not None: self.queue.join()
+
+    def _run(self):
+        while True:
+            op, path, data = self.queue.get()
+            try:
+                if op == "write":
+                    temp_path = f"{path}.tmp"
+                    with open(temp_path, 'w') as f: json.dump(data, f, separators=(',', ':')); f.flush(); os.fsync(f.fileno())
+                    os.replace(temp_path, path); self.writes += 1
+                elif os.path.exists(path): os.remove(path)
+            except OSError as e: self.errors += 1; print(f"Could not {op} '{path}': {e}")
+            finally:
+                with self.lock: self.pending[path] -= 1
+                self.queue.task_done()
+
+save_writer = SaveWriter()
@@ -0,0 +1,101 @@
+# simulation.py
+# Headless, fixed-timestep driver for GameEngine: no window, no audio device and no UIManager.
+import json, time
+from assets import MAPS, DOG_TOWERS
+from utilities import DIFFICULTY_SETTINGS, SIM_DT
+from sound_manager import NullSoundManager
+from game_engine import GameEngine
+
+MAX_ROUND_SECONDS = 600 # Safety cap so a stalled round (e.g. un-poppable shapes) can't hang a run
+
+class HeadlessGame:
+    """Stand-in for main.Game that carries only what GameEngine reads."""
+    def __init__(self, map_id, difficulty, use_enemy_store=False):
+        self.selected_map, self.selected_difficulty, self.game_speed = map_id, difficulty, 1.0
+        self.sound_manager = NullSoundManager()
+        self.game_engine = GameEngine(self, autosave=False, use_enemy_store=use_enemy_store)
+
+def load_layout(path):
+    """Reads a tower layout: a JSON list of entries shaped like DogTower.serialize() (upgrades/targeting optional)."""
+    with open(path, 'r') as f: layout = json.load(f)
+    return layout['towers'] if isinstance(layout, dict) else layout
+
+class Simulation:
+    """Plays rounds of one map as fast as the CPU allows, building the layout in order as money permits.
+    An upgrade script ([{"tower": layout index, "path": 0-2}, ...]) is bought after the layout, one tier per step."""
+    def __init__(self, map_id, difficulty, layout=(), dt=SIM_DT, use_enemy_store=False, upgrade_script=()):
+        if map_id not in MAPS: raise ValueError(f"Unknown map '{map_id}'")
+        if difficulty not in DIFFICULTY_SETTINGS: raise ValueError(f"Unknown difficulty '{difficulty}'")
+        self.dt, self.game = dt, HeadlessGame(map_id, difficulty, use_enemy_store)
+        self.engine = self.game.game_engine; self.engine.start_new_game(map_id, difficulty)
+        self.layout, self.towers, self.skipped, self.round_results = list(layout), {}, [], []
+        # Build order: each tower is placed, then its upgrades are bought path by path (same order as DogTower.deserialize)
+        self.build_steps = []
+        for index, entry in enumerate(self.layout):
+            if entry['tower_id'] not in DOG_TOWERS: raise ValueError(f"Unknown tower '{entry['tower_id']}'")
+            self.build_steps.append(("place", index, None))
+            for path_index, tier in enumerate(entry.get('upgrades', [0, 0, 0])): self.build_steps.extend(("upgrade", index, path_index) for _ in range(tier))
+        for step in upgrade_script:
+            if not 0 <= step['tower'] < len(self.layout) or step['path'] not in (0, 1, 2): raise ValueError(f"Bad upgrade script step {step}")
+            self.build_steps.append(("upgrade", step['tower'], step['path']))
+
+    def build(self):
+        """Executes pending build steps until one is unaffordable; impossible steps are skipped and reported."""
+        engine = self.engine
+        while self.build_steps:
+            step, index, path_index = self.build_steps[0]; entry = self.layout[index]
+            if step == "place":
+                if engine.money < engine.get_tower_cost(entry['tower_id']): return
+                if not engine.place_tower(entry['tower_id'], tuple(entry['position'])):
+                    self.skipped.append(f"place {entry['tower_id']} at {tuple(entry['position'])}: invalid placement")
+                    self.build_steps = [s for s in self.build_steps if s[1] != index]; continue
+                tower = engine.towers[-1]; self.towers[index] = tower
+                if entry.get('targeting', tower.targeting_priority) != tower.targeting_priority: engine.set_targeting(tower, entry['targeting'])
+            else:
+                tower = self.towers[index]; tier = tower.upgrades[path_index]
+                if tier >= 5: self.skipped.append(f"upgrade tower {index} path {path_index+1}: already maxed")
+                else:
+                    if engine.money < DOG_TOWERS[tower.tower_id]['upgrades'][f'path{path_index+1}'][tier]['cost']: return
+                    engine.upgrade_tower(tower, path_index)
+                    if tower.upgrades[path_index] == tier: self.skipped.append(f"upgrade tower {index} path {path_index+1}: path locked")
+            self.build_steps.pop(0)
+
+    def play_round(self):
+        """Builds what it can, then plays one round to completion with a fixed dt. Returns the round's result."""
+        engine = self.engine; self.build()
+        lives_before, start = engine.lives, time.perf_counter()
+        engine.start_next_round()
+        if engine.win: return None
+        ticks, max_ticks = 0, int(MAX_ROUND_SECONDS / self.dt)
+        while engine.is_round_active and not engine.lose and ticks < max_ticks: engine.update(self.dt); ticks += 1
+        result = {"round": engine.current_round, "leaks": lives_before - engine.lives, "lives": engine.lives, "money": engine.money, "ticks": ticks,
+                  "wall_time": time.perf_counter() - start, "timed_out": ticks >= max_ticks, "pops": [t.pop_count for t in engine.towers],
+                  "layout_pops": {index: tower.pop_count for index, tower in self.towers.items()}} # Cumulative, keyed by layout index
+        self.round_results.append(result); return result
+
+    def run(self, rounds=None, on_round=None):
+        """Plays up to `rounds` rounds (all of them by default), stopping early on a win or loss."""
+        start, played = time.perf_counter(), 0
+        while (rounds is None or played < rounds) and not (self.engine.win or self.engine.lose):
+            result = self.play_round()
+            if result is None: break
+            played += 1
+            if on_round: on_round(result)
+        wall_time = time.perf_counter() - start; ticks = sum(r['ticks'] for r in self.round_results[-played:]) if played else 0
+        return {"map_id": self.game.selected_map, "difficulty": self.game.selected_difficulty, "rounds_played": played,
+                "rounds_per_second": played / wall_time if wall_time > 0 else 0.0, "ticks_per_second": ticks / wall_time if wall_time > 0 else 0.0,
+                "total_leaks": sum(r['leaks'] for r in self.round_results[-played:]) if played else 0, "lives": self.engine.lives, "money": self.engine.money,
+                "win": self.engine.win, "lose": self.engine.lose, "wall_time": wall_time, "skipped": self.skipped, "pools": self.engine.pool_stats()}
+
+def run_headless(args):
+    """Entry point for `main.py --headless`; prints one line per round and a summary."""
+    layout = load_layout(args.layout) if args.layout else []
+    sim = Simulation(args.map, args.difficulty, layout, dt=args.dt, use_enemy_store=args.enemy_store)
+    def report(r): print(f"Round {r['round']:3d}: leaks {r['leaks']:4d}  lives {r['lives']:4d}  money {r['money']:7d}  ({r['ticks']} ticks, {r['wall_time']*1000:.1f} ms)")
+    summary = sim.run(args.rounds, on_round=None if args.quiet else report)
+    for message in summary['skipped']: print(f"Skipped: {message}")
+    outcome = "WIN" if summary['win'] else "LOSS" if summary['lose'] else "IN PROGRESS"
+    print(f"{summary['map_id']}/{summary['difficulty']}: {summary['rounds_played']} rounds in {summary['wall_time']:.2f}s "
+          f"({summary['rounds_per_second']:.1f} rounds/s, {summary['ticks_per_second']:.0f} ticks/s) | leaks {summary['total_leaks']} | "
+          f"lives {summary['lives']} | money {summary['money']} | {outcome}")
+    return summary
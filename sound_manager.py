@@ -2,15 +2,36 @@
 import pygame
 import os
 import json
+import threading, time, math
 from utilities import SETTINGS_FILE
 
+SOUND_FILES = {
+    'click': "sounds/click.wav", 'pop': "sounds/pop.wav",
+    'place_tower': "sounds/place_tower.wav", 'sell': "sounds/sell.wav",
+    'shoot_bark': "sounds/shoot_bark.wav", 'shoot_cannon': "sounds/shoot_cannon.wav",
+    'shoot_sniper': "sounds/shoot_sniper.wav"
+}
+# --- Scheduling: play_sound() only counts a request; flush() (once per frame) turns each sound's requests into at most one voice ---
+SOUND_PRIORITIES = {'click': 2, 'place_tower': 2, 'sell': 2, 'shoot_cannon': 1, 'shoot_sniper': 1, 'shoot_bark': 0, 'pop': 0} # Higher steals channels from lower
+SOUND_MIN_INTERVALS = {'pop': 0.05, 'shoot_bark': 0.06, 'shoot_cannon': 0.08, 'shoot_sniper': 0.08} # Seconds between voices of one sound; others unlimited
+SOUND_MAX_VOICES = {'pop': 4, 'shoot_bark': 3, 'shoot_cannon': 2, 'shoot_sniper': 2} # Voices of one sound playing at once
+MIXER_CHANNELS = 16
+COALESCE_GAIN, COALESCE_MAX_GAIN = 0.25, 2.0 # N requests in a frame play one voice at 1 + 0.25*log2(N) times the volume, capped
+
 class SoundManager:
     def __init__(self):
         self.is_sound_enabled = False
         self.music_volume = 0.3
         self.sfx_volume = 0.5
+        self.stats = {"requested": 0, "played": 0, "coalesced": 0, "dropped": 0}
+        self.sounds, self.requests, self.last_played = {}, {}, {}
+        self.music_path, self.music_wanted, self.lock = None, False, threading.Lock()
         self.load_settings()
+        # Opening the audio device and decoding the wavs are the slow part of startup: both happen on this thread, and
+        # until it's done the game runs silently (sound requests are ignored; music starts once the mixer is up)
+        self.loader = threading.Thread(target=self._start_audio, name="sound-loader", daemon=True); self.loader.start()
 
+    def _start_audio(self):
         try:
             pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
         except pygame.error:
@@ -19,45 +40,74 @@ class SoundManager:
                 print(f"FATAL: Could not initialize Pygame mixer: {e}. Sounds will be disabled.")
                 return
 
-        self.sounds = {}
-        sound_files = {
-            'click': "sounds/click.wav", 'pop': "sounds/pop.wav",
-            'place_tower': "sounds/place_tower.wav", 'sell': "sounds/sell.wav",
-            'shoot_bark': "sounds/shoot_bark.wav", 'shoot_cannon': "sounds/shoot_cannon.wav",
-            'shoot_sniper': "sounds/shoot_sniper.wav"
-        }
-        all_files_loaded = True
-        for name, path in sound_files.items():
+        pygame.mixer.set_num_channels(MIXER_CHANNELS)
+        self.channels = [pygame.mixer.Channel(i) for i in range(MIXER_CHANNELS)]
+        self.channel_sounds = [None] * MIXER_CHANNELS # Name of the sound each channel was last given
+        self.channel_started = [0.0] * MIXER_CHANNELS
+
+        music_path = "sounds/music.ogg"
+        if not os.path.exists(music_path): print(f"Warning: Music file not found at '{music_path}'"); music_path = None
+        with self.lock: self.music_path, self.is_sound_enabled = music_path, True; start_music = self.music_wanted
+        if start_music: self._start_music()
+
+        all_files_loaded = True # Requests for a sound not loaded yet are dropped
+        for name, path in SOUND_FILES.items():
             if not os.path.exists(path):
                 print(f"Warning: Sound file not found at '{path}'")
                 all_files_loaded = False; continue
             try: self.sounds[name] = pygame.mixer.Sound(path)
             except pygame.error as e: print(f"CRITICAL: Failed to load '{path}': {e}"); all_files_loaded = False
-        
-        self.set_sfx_volume(self.sfx_volume) # Apply loaded/default volume
-            
-        self.music_path = "sounds/music.ogg"
-        if not os.path.exists(self.music_path): self.music_path = None; all_files_loaded = False
-        
         if all_files_loaded: print("Sound Manager initialized successfully.")
         else: print("Some sound files failed to load. Sound effects may be missing.")
-        self.is_sound_enabled = True
 
     def play_sound(self, name):
-        if self.is_sound_enabled and name in self.sounds: self.sounds[name].play()
+        """Requests `name` for this frame; nothing is played until flush()."""
+        if self.is_sound_enabled: self.requests[name] = self.requests.get(name, 0) + 1
+
+    def flush(self):
+        """Plays this frame's requests: one voice per sound (louder when several were coalesced), highest priority first,
+        subject to each sound's rate limit and voice cap. Requests that get no voice are counted as dropped."""
+        if not self.requests: return
+        requests, self.requests, stats, now = self.requests, {}, self.stats, time.perf_counter()
+        for name in sorted(requests, key=lambda n: -SOUND_PRIORITIES.get(n, 1)):
+            count = requests[name]; stats["requested"] += count
+            sound = self.sounds.get(name)
+            if sound is None or now - self.last_played.get(name, -1e9) < SOUND_MIN_INTERVALS.get(name, 0.0): stats["dropped"] += count; continue
+            channel = self._find_channel(name, now)
+            if channel is None: stats["dropped"] += count; continue
+            channel.set_volume(min(1.0, self.sfx_volume * min(COALESCE_MAX_GAIN, 1 + COALESCE_GAIN * math.log2(count))))
+            channel.play(sound); self.last_played[name] = now; stats["played"] += 1; stats["coalesced"] += count - 1
+
+    def _find_channel(self, name, now):
+        # A free channel if there is one (within the sound's voice cap), otherwise the oldest voice of lower priority
+        priority, busy_same, free, victim = SOUND_PRIORITIES.get(name, 1), [], None, None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                if free is None: free = i
+                continue
+            playing = self.channel_sounds[i]
+            if playing == name: busy_same.append(i)
+            elif SOUND_PRIORITIES.get(playing, 1) < priority and (victim is None or (SOUND_PRIORITIES.get(playing, 1), self.channel_started[i]) < (SOUND_PRIORITIES.get(self.channel_sounds[victim], 1), self.channel_started[victim])): victim = i
+        if len(busy_same) >= SOUND_MAX_VOICES.get(name, MIXER_CHANNELS): return None
+        index = free if free is not None else victim
+        if index is None: return None
+        if index == victim: self.channels[index].stop()
+        self.channel_sounds[index], self.channel_started[index] = name, now
+        return self.channels[index]
 
     def play_music(self):
-        if self.is_sound_enabled and self.music_path:
-            try:
-                pygame.mixer.music.load(self.music_path)
-                pygame.mixer.music.set_volume(self.music_volume) # Apply loaded/default volume
-                pygame.mixer.music.play(-1)
-            except pygame.error as e: print(f"CRITICAL: Failed to load music: {e}")
-
-    def set_sfx_volume(self, volume):
-        self.sfx_volume = max(0.0, min(1.0, volume))
-        if self.is_sound_enabled:
-            for sound in self.sounds.values(): sound.set_volume(self.sfx_volume)
+        with self.lock: self.music_wanted = True; ready = self.is_sound_enabled # Otherwise the loader starts it once the mixer is up
+        if ready: self._start_music()
+
+    def _start_music(self):
+        if not self.music_path: return
+        try:
+            pygame.mixer.music.load(self.music_path)
+            pygame.mixer.music.set_volume(self.music_volume) # Apply loaded/default volume
+            pygame.mixer.music.play(-1)
+        except pygame.error as e: print(f"CRITICAL: Failed to load music: {e}")
+
+    def set_sfx_volume(self, volume): self.sfx_volume = max(0.0, min(1.0, volume)) # Applied per voice, as the channel volume
 
     def set_music_volume(self, volume):
         self.music_volume = max(0.0, min(1.0, volume))
@@ -76,3 +126,14 @@ class SoundManager:
                 self.sfx_volume = settings.get("sfx_volume", 0.5)
         except (IOError, json.JSONDecodeError):
             print(f"Could not load settings from {SETTINGS_FILE}. Using defaults.")
+
+class NullSoundManager:
+    """Silent stand-in used when the engine runs without an audio device (headless simulation)."""
+    is_sound_enabled, music_volume, sfx_volume = False, 0.0, 0.0
+    stats = {"requested": 0, "played": 0, "coalesced": 0, "dropped": 0}
+    def play_sound(self, name): pass
+    def flush(self): pass
+    def play_music(self): pass
+    def set_sfx_volume(self, volume): pass
+    def set_music_volume(self, volume): pass
+    def save_settings(self): pass
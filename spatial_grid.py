@@ -0,0 +1,53 @@
+# spatial_grid.py
+# Uniform-grid spatial index of active enemies, used for tower range queries and AoE blast queries.
+import math
+
+DEFAULT_CELL_SIZE = 64
+
+class SpatialHashGrid:
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size, self.cells, self.count = cell_size, {}, 0
+
+    def clear(self): self.cells, self.count = {}, 0
+
+    def _cell(self, pos): return (math.floor(pos.x / self.cell_size), math.floor(pos.y / self.cell_size))
+
+    def rebuild(self, enemies):
+        """Re-buckets every enemy; called once per tick after movement."""
+        cells, cell_size, floor = {}, self.cell_size, math.floor
+        for enemy in enemies:
+            pos = enemy.pos; key = (floor(pos.x / cell_size), floor(pos.y / cell_size))
+            bucket = cells.get(key)
+            if bucket is None: cells[key] = [enemy]
+            else: bucket.append(enemy)
+        self.cells, self.count = cells, len(enemies)
+
+    def rebuild_arrays(self, entities, xs, ys):
+        """Bulk rebuild from EnemyStore.active_columns(); buckets are cut from one sort instead of a per-enemy loop."""
+        import numpy as np
+        if not len(entities): self.cells, self.count = {}, 0; return
+        cx, cy = np.floor(xs / self.cell_size).astype(np.int64), np.floor(ys / self.cell_size).astype(np.int64)
+        order = np.lexsort((cy, cx)); cx, cy, entities = cx[order], cy[order], entities[order]
+        starts = np.flatnonzero(np.concatenate(([True], (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1]))))
+        ends = np.append(starts[1:], len(entities))
+        self.cells = {(int(cx[s]), int(cy[s])): entities[s:e].tolist() for s, e in zip(starts, ends)}; self.count = len(entities)
+
+    def insert(self, enemy):
+        """Adds an enemy that appeared mid-tick (spawns, pop children) so later queries in the same tick see it."""
+        self.cells.setdefault(self._cell(enemy.pos), []).append(enemy); self.count += 1
+
+    def insert_many(self, enemies):
+        for enemy in enemies: self.insert(enemy)
+
+    def query_radius(self, pos, radius, sort=False):
+        """Active enemies with pos.distance_to(enemy.pos) <= radius. With sort=True they come back in spawn order (uid)."""
+        cell_size, cells = self.cell_size, self.cells
+        min_cx, max_cx = math.floor((pos.x - radius) / cell_size), math.floor((pos.x + radius) / cell_size)
+        min_cy, max_cy = math.floor((pos.y - radius) / cell_size), math.floor((pos.y + radius) / cell_size)
+        # Huge radii (e.g. global range upgrades) cover more cells than are occupied; walk the occupied ones instead
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(cells): buckets = cells.values()
+        else: buckets = [b for b in (cells.get((cx, cy)) for cx in range(min_cx, max_cx + 1) for cy in range(min_cy, max_cy + 1)) if b]
+        distance_to = pos.distance_to
+        found = [e for bucket in buckets for e in bucket if e.is_active and distance_to(e.pos) <= radius]
+        if sort: found.sort(key=lambda e: e.uid)
+        return found
@@ -0,0 +1,43 @@
+# spawn_scheduler.py
+# Lazy k-way merge of a round's spawn groups: each ROUND_COMPOSITIONS entry is an arithmetic sequence of spawn times,
+# so only one pending spawn per group is materialized instead of one tuple per enemy for the whole round.
+import heapq
+
+class SpawnScheduler:
+    """Emits (enemy_id, path) in the order the old reverse-sorted spawn list was popped: by time, and among equal times
+    the later-listed spawn first. Group i of a round sends its n-th enemy down paths[n % len(paths)]."""
+    def __init__(self, groups=(), paths=()):
+        self.paths, self.groups, self.heap, self.remaining, offset = list(paths), [], [], 0, 0
+        for enemy_id, count, start_time, end_time in groups:
+            if count <= 0: continue
+            spacing = (end_time-start_time)/count if count>1 else 0
+            # Equal-time spawns leave last-listed first, so a zero-spacing group is walked from its end
+            first, step = (count - 1, -1) if spacing == 0 else (0, 1)
+            group = len(self.groups); self.groups.append((enemy_id, count, start_time, spacing, step, offset))
+            self._push(group, first); offset += count; self.remaining += count
+
+    def _push(self, group, i):
+        _, _, start_time, spacing, _, offset = self.groups[group]
+        heapq.heappush(self.heap, (start_time + i*spacing, -(offset + i), group, i))
+
+    def __len__(self): return self.remaining
+
+    def state(self):
+        """The cursor (pending heap entries and spawns left) as JSON-friendly lists; restore() it on a scheduler built from the same groups."""
+        return {"heap": [list(entry) for entry in self.heap], "remaining": self.remaining}
+
+    def restore(self, state): self.heap, self.remaining = [tuple(entry) for entry in state["heap"]], state["remaining"]; heapq.heapify(self.heap)
+
+    def next_time(self):
+        """Time of the next spawn, or None when the round has nothing left to spawn."""
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """Every spawn whose time is <= now, in order, as a list of (enemy_id, path); several may fall in one tick."""
+        due, heap = [], self.heap
+        while heap and heap[0][0] <= now:
+            _, _, group, i = heapq.heappop(heap); enemy_id, count, _, _, step, _ = self.groups[group]
+            due.append((enemy_id, self.paths[i % len(self.paths)]))
+            if 0 <= i + step < count: self._push(group, i + step)
+        self.remaining -= len(due)
+        return due
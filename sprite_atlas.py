@@ -0,0 +1,195 @@
+# sprite_atlas.py
+# Rasterizes every tower (all legal upgrade combinations), enemy, UI icon/panel and map decoration at the scales the
+# Renderer uses, packs them into one atlas image plus a JSON index, and loads it back so no sprite is built mid-round.
+import json, os, re, math, hashlib, threading
+from functools import lru_cache
+import pygame
+from assets import DOG_TOWERS, GEOMETRIC_ENEMIES, UI_ICONS, UI_ASSETS, MAP_DECORATIONS
+from game_objects import legal_upgrade_combos
+
+ATLAS_VERSION = 1 # Bump when the rasterizer changes, so stale atlases on disk are rebuilt
+ATLAS_WIDTH = 2048
+ATLAS_PADDING = 1
+# (asset dict, scales, whether every upgrade combination is drawn): the scales Renderer._draw_asset is called with
+ATLAS_SPECS = ((DOG_TOWERS, (1.2, 2.0), True), (DOG_TOWERS, (0.9,), False), (GEOMETRIC_ENEMIES, (1.0,), False),
+               (UI_ICONS, (0.6, 0.7, 0.8, 1.0), False), (UI_ASSETS, (1.0,), False), (MAP_DECORATIONS, (1.0,), False))
+
+@lru_cache(maxsize=None)
+def parse_svg_path(path_string, steps=15):
+    """Flattens an SVG path (M/L/H/V/C/Q/Z) into subpaths of points; Béziers are sampled `steps` times. Memoized per string."""
+    tokens=re.findall(r"([MmLlHhVvCcSsQqTtAaZz])|(-?\d+(?:\.\d+)?)",path_string); subpaths,current_subpath,i=[],None,0; current_pos,path_start=pygame.Vector2(0,0),pygame.Vector2(0,0)
+    while i<len(tokens):
+        cmd_char=tokens[i][0]; i+=1;
+        if not cmd_char: continue
+        is_relative=cmd_char.islower(); cmd_type=cmd_char.lower()
+        def get_params(count):
+            nonlocal i; params=[]
+            while len(params)<count and i<len(tokens) and not tokens[i][0]:params.append(float(tokens[i][1])); i+=1
+            return params
+        implicit_cmd='l' if cmd_type=='m' else cmd_type
+        while True:
+            params=get_params({'m':2,'l':2,'h':1,'v':1,'c':6,'q':4,'s':4,'t':2,'z':0}.get(cmd_type,0))
+            if not params and cmd_type not in 'z': break
+            if cmd_type=='m':
+                if current_subpath:subpaths.append(current_subpath)
+                current_subpath={'points':[],'closed':False}; current_pos=current_pos+params if is_relative else pygame.Vector2(params); path_start=current_pos; current_subpath['points'].append(path_start)
+            elif cmd_type=='l': current_pos=current_pos+params if is_relative else pygame.Vector2(params); current_subpath['points'].append(current_pos)
+            elif cmd_type=='h': current_pos.x=current_pos.x+params[0] if is_relative else params[0]; current_subpath['points'].append(current_pos.copy())
+            elif cmd_type=='v': current_pos.y=current_pos.y+params[0] if is_relative else params[0]; current_subpath['points'].append(current_pos.copy())
+            elif cmd_type=='c':
+                p1,p2,p3=(current_pos+params[0:2] if is_relative else pygame.Vector2(params[0:2])),(current_pos+params[2:4] if is_relative else pygame.Vector2(params[2:4])),(current_pos+params[4:6] if is_relative else pygame.Vector2(params[4:6]))
+                for t in[i/steps for i in range(1,steps+1)]:omt=1-t;current_subpath['points'].append((omt**3*current_pos)+(3*omt**2*t*p1)+(3*omt*t**2*p2)+(t**3*p3))
+                current_pos=p3
+            elif cmd_type=='q':
+                p1,p2=(current_pos+params[0:2] if is_relative else pygame.Vector2(params[0:2])),(current_pos+params[2:4] if is_relative else pygame.Vector2(params[2:4]))
+                for t in[i/steps for i in range(1,steps+1)]:omt=1-t;current_subpath['points'].append((omt**2*current_pos)+(2*omt*t*p1)+(t**2*p2))
+                current_pos=p2
+            elif cmd_type=='z':
+                if current_subpath:current_subpath['closed']=True
+            cmd_type=implicit_cmd
+            if i>=len(tokens) or tokens[i][0]:break
+    if current_subpath:subpaths.append(current_subpath)
+    return tuple((tuple((p[0], p[1]) for p in sub['points']), sub['closed']) for sub in subpaths)
+
+def _stroke_width(params, scale): return int(params.get('stroke_width',1)*scale) if params.get('stroke_width',1)>0 else 0
+
+def draw_svg_shape(surface, params, offset, scale):
+    color, stroke_color, stroke_width = params.get('fill'), params.get('stroke'), _stroke_width(params, scale)
+    def scale_pt(pt, off): return (pt[0]*scale + off.x, pt[1]*scale + off.y)
+    shape_type = params.get('shape')
+    if not shape_type: return
+    if shape_type == 'polygon':
+        points_list = [float(p) for p in params['points'].replace(",", " ").split()]; points=[scale_pt((points_list[i], points_list[i+1]), offset) for i in range(0,len(points_list),2)]
+        if color: pygame.draw.polygon(surface, color, points)
+        if stroke_color and stroke_width > 0: pygame.draw.polygon(surface, stroke_color, points, stroke_width)
+    elif shape_type == 'circle':
+        pos, radius = (params.get('cx',0)*scale+offset.x, params.get('cy',0)*scale+offset.y), int(params.get('r',0)*scale)
+        if radius > 0:
+            if color: pygame.draw.circle(surface, color, pos, radius)
+            if stroke_color and stroke_width > 0: pygame.draw.circle(surface, stroke_color, pos, radius, stroke_width)
+    elif shape_type == 'rect':
+         rect = pygame.Rect(params['x']*scale+offset.x, params['y']*scale+offset.y, params['width']*scale, params['height']*scale)
+         if color: pygame.draw.rect(surface, color, rect)
+         if stroke_color and stroke_width > 0: pygame.draw.rect(surface, stroke_color, rect, stroke_width)
+    elif shape_type == 'path':
+        for points, is_closed in parse_svg_path(params.get('d',"")):
+            scaled_points = [scale_pt(p, offset) for p in points]
+            if len(scaled_points)>1:
+                if len(scaled_points)>2 and is_closed and color: pygame.draw.polygon(surface, color, scaled_points)
+                if stroke_color and stroke_width > 0: pygame.draw.lines(surface, stroke_color, is_closed, scaled_points, stroke_width)
+
+def _shape_bounds(params, scale):
+    """(min_x, min_y, max_x, max_y) of one shape in scaled coordinates around the sprite origin, stroke included; None if empty."""
+    shape_type = params.get('shape')
+    if shape_type == 'polygon': nums = [float(p) for p in params['points'].replace(",", " ").split()]; points = list(zip(nums[0::2], nums[1::2]))
+    elif shape_type == 'circle': cx, cy, r = params.get('cx',0), params.get('cy',0), int(params.get('r',0)*scale) / scale if scale else 0; points = [(cx - r, cy - r), (cx + r, cy + r)]
+    elif shape_type == 'rect': points = [(params['x'], params['y']), (params['x'] + params['width'], params['y'] + params['height'])]
+    elif shape_type == 'path': points = [p for sub, _ in parse_svg_path(params.get('d',"")) for p in sub]
+    else: return None
+    if not points: return None
+    pad = _stroke_width(params, scale) + 2 # Outlines and anti-aliasing can spill a little past the geometry
+    xs, ys = [p[0]*scale for p in points], [p[1]*scale for p in points]
+    return (min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad)
+
+def sprite_parts(asset_data, upgrades=None):
+    """The base SVG merged with the upgrade overlays unlocked by `upgrades` (a later tier replaces parts of the same name)."""
+    svg_data_root = asset_data.get('svg_params') or asset_data.get('svg')
+    if not svg_data_root: return None
+    all_svg_parts = dict(svg_data_root)
+    if upgrades is not None:
+        for path_index, tier in enumerate(upgrades):
+            for i in range(1, tier + 1):
+                if f"{path_index+1}_{i}" in asset_data.get("upgrade_svgs", {}): all_svg_parts.update(asset_data["upgrade_svgs"][f"{path_index+1}_{i}"])
+    return all_svg_parts
+
+def render_sprite(all_svg_parts, scale):
+    """Rasterizes merged parts onto a surface cropped to its exact visible pixels. Returns (surface, anchor), where
+    `anchor` is the pixel of the surface that sits on the entity's position; (None, None) if nothing is visible."""
+    shapes = [all_svg_parts] if 'shape' in all_svg_parts else [all_svg_parts[name] for name in sorted(all_svg_parts.keys())]
+    bounds = [b for b in (_shape_bounds(p, scale) for p in shapes) if b]
+    if not bounds: return None, None
+    min_x, min_y = math.floor(min(b[0] for b in bounds)), math.floor(min(b[1] for b in bounds))
+    width, height = math.ceil(max(b[2] for b in bounds)) - min_x + 1, math.ceil(max(b[3] for b in bounds)) - min_y + 1
+    surface = pygame.Surface((width, height), pygame.SRCALPHA); origin = pygame.Vector2(-min_x, -min_y)
+    for params in shapes: draw_svg_shape(surface, params, origin, scale)
+    visible = surface.get_bounding_rect()
+    if visible.width == 0 or visible.height == 0: return None, None
+    return surface.subsurface(visible).copy(), (-min_x - visible.x, -min_y - visible.y)
+
+def atlas_entries():
+    """Yields (key, parts, scale) for every sprite the game can draw; key matches Renderer's (entity_id, scale, upgrades)."""
+    for asset_dict, scales, with_upgrades in ATLAS_SPECS:
+        for entity_id, asset_data in asset_dict.items():
+            for upgrades in (legal_upgrade_combos() if with_upgrades else [(0, 0, 0)]):
+                parts = sprite_parts(asset_data, upgrades)
+                if parts is None: continue
+                for scale in scales: yield (entity_id, scale, upgrades), parts, scale
+
+def atlas_digest():
+    """Changes whenever the sprite set or rasterizer does, so an out-of-date atlas file is never used."""
+    return hashlib.sha1(repr((ATLAS_VERSION, ATLAS_SPECS)).encode()).hexdigest()
+
+def build_sprites():
+    """Renders every atlas entry; entries with identical parts and scale share one surface. Returns {key: (surface, anchor)}."""
+    sprites, rendered = {}, {}
+    for key, parts, scale in atlas_entries():
+        shape_key = (repr(parts), scale)
+        if shape_key not in rendered:
+            try: rendered[shape_key] = render_sprite(parts, scale)
+            except (ValueError, TypeError): rendered[shape_key] = None # e.g. an SVG gradient fill pygame can't draw; left to the lazy path
+        if rendered[shape_key] is not None: sprites[key] = rendered[shape_key]
+    return sprites
+
+def _pack(sprites):
+    """Shelf-packs the distinct surfaces, tallest first. Returns ({id(surface): rect}, atlas height)."""
+    unique = {id(s): s for s, _ in sprites.values() if s is not None}
+    placed, x, y, shelf = {}, 0, 0, 0
+    for sid, surface in sorted(unique.items(), key=lambda item: (-item[1].get_height(), -item[1].get_width())):
+        w, h = surface.get_size()
+        if x + w > ATLAS_WIDTH: x, y, shelf = 0, y + shelf + ATLAS_PADDING, 0
+        placed[sid] = pygame.Rect(x, y, w, h); x += w + ATLAS_PADDING; shelf = max(shelf, h)
+    return placed, y + shelf
+
+def _key_str(key): entity_id, scale, upgrades = key; return f"{entity_id}|{scale}|{','.join(map(str, upgrades))}"
+
+def save_atlas(sprites, directory):
+    """Writes atlas.png and atlas.json (sprite rects and anchors) into `directory`, replacing any previous atlas."""
+    placed, height = _pack(sprites)
+    atlas = pygame.Surface((ATLAS_WIDTH, max(1, height)), pygame.SRCALPHA)
+    for surface, _ in sprites.values():
+        if surface is not None: atlas.blit(surface, placed[id(surface)], special_flags=pygame.BLEND_RGBA_MAX) # Copies pixels (alpha included) instead of blending
+    index = {_key_str(key): (list(placed[id(surface)]) + list(anchor) if surface is not None else None) for key, (surface, anchor) in sprites.items()}
+    os.makedirs(directory, exist_ok=True)
+    pygame.image.save(atlas, os.path.join(directory, "atlas.png"))
+    with open(os.path.join(directory, "atlas.json"), 'w') as f: json.dump({"digest": atlas_digest(), "sprites": index}, f)
+
+def load_atlas(directory):
+    """Reads an atlas written by save_atlas. Returns {key: (surface, anchor)}, or None if it is missing or stale."""
+    try:
+        with open(os.path.join(directory, "atlas.json"), 'r') as f: data = json.load(f)
+        if data.get("digest") != atlas_digest(): return None
+        atlas = pygame.image.load(os.path.join(directory, "atlas.png"))
+    except (OSError, ValueError, pygame.error): return None
+    if pygame.display.get_surface(): atlas = atlas.convert_alpha()
+    sprites = {}
+    for key_str, entry in data["sprites"].items():
+        entity_id, scale, upgrades = key_str.split('|'); key = (entity_id, float(scale), tuple(int(u) for u in upgrades.split(',')))
+        sprites[key] = (atlas.subsurface(pygame.Rect(entry[:4])), (entry[4], entry[5])) if entry else (None, None)
+    return sprites
+
+def warm_in_background(directory, on_ready):
+    """Loads the atlas on a daemon thread (building and saving it first if it's missing or stale), then calls
+    on_ready(sprites). Drawing falls back to lazy sprites meanwhile."""
+    def work():
+        sprites = load_atlas(directory)
+        if sprites is None:
+            sprites = build_sprites()
+            try: save_atlas(sprites, directory)
+            except (OSError, pygame.error) as e: print(f"Warning: Could not write sprite atlas to '{directory}': {e}")
+        on_ready(sprites)
+    thread = threading.Thread(target=work, name="sprite-atlas", daemon=True); thread.start(); return thread
+
+if __name__ == "__main__":
+    from utilities import SPRITE_ATLAS_DIR
+    pygame.init(); sprites = build_sprites(); save_atlas(sprites, SPRITE_ATLAS_DIR)
+    print(f"Wrote {len(sprites)} sprites ({len({id(s) for s, _ in sprites.values() if s is not None})} distinct) to {SPRITE_ATLAS_DIR}/atlas.png")
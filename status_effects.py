@@ -0,0 +1,33 @@
+# status_effects.py
+# Engine-wide expiry heap for timed status effects (slows, stuns, ...): effects are stamped with an expiry time on the
+# engine's clock and popped in bulk as the clock passes it, so enemies without effects cost nothing per tick and
+# an enemy's speed is only recomputed when one of its effects starts or ends.
+import heapq, itertools
+
+EFFECT_SPEED_MULTIPLIERS = {"slow": 0.5, "stun": 0.0} # Effects not listed here leave speed alone
+
+def speed_multiplier(status_effects):
+    multiplier = 1.0
+    for effect in status_effects: multiplier *= EFFECT_SPEED_MULTIPLIERS.get(effect, 1.0)
+    return multiplier
+
+class StatusEffectTimers:
+    """enemy.status_effects maps effect -> expiry time on this clock. Re-applying an effect overwrites its expiry (the
+    latest application wins, even if shorter); the superseded heap entry is skipped when it surfaces."""
+    def __init__(self): self.now, self.heap, self._order = 0.0, [], itertools.count()
+
+    def apply(self, enemy, effect, duration):
+        expires, is_new = self.now + duration, effect not in enemy.status_effects
+        enemy.status_effects[effect] = expires; heapq.heappush(self.heap, (expires, next(self._order), enemy, effect))
+        if is_new: enemy.refresh_speed()
+
+    def track(self, enemy):
+        """Schedules the expiries an enemy already carries (a member split off a stack copies the stack's effects)."""
+        for effect, expires in enemy.status_effects.items(): heapq.heappush(self.heap, (expires, next(self._order), enemy, effect))
+
+    def advance(self, dt):
+        """Moves the clock on by dt and ends every effect whose expiry has been reached."""
+        self.now += dt; heap, now = self.heap, self.now
+        while heap and heap[0][0] <= now:
+            expires, _, enemy, effect = heapq.heappop(heap)
+            if enemy.status_effects.get(effect) == expires: del enemy.status_effects[effect]; enemy.refresh_speed()
@@ -0,0 +1,130 @@
+# sweep.py
+# Balance sweeps: runs the headless Simulation over a grid of maps x difficulties x layouts x upgrade scripts x asset
+# overrides on a process pool, streaming one row per played round to a JSONL or CSV file as runs finish.
+import argparse, csv, itertools, json, multiprocessing, os, sys, time
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from assets import MAPS, DOG_TOWERS, GEOMETRIC_ENEMIES, ROUND_COMPOSITIONS
+from utilities import DIFFICULTY_SETTINGS
+from simulation import Simulation, load_layout
+from game_objects import compile_stats
+
+# Tables an override may patch, by the name used in override keys such as "DOG_TOWERS.corgi_cannon.cost"
+OVERRIDABLE = {"DIFFICULTY_SETTINGS": DIFFICULTY_SETTINGS, "DOG_TOWERS": DOG_TOWERS, "GEOMETRIC_ENEMIES": GEOMETRIC_ENEMIES, "ROUND_COMPOSITIONS": ROUND_COMPOSITIONS}
+CSV_FIELDS = ["run_id", "map_id", "difficulty", "layout", "upgrade_script", "overrides", "round", "leaks", "lives", "money", "ticks", "wall_time", "timed_out", "pops", "error"]
+_MISSING = object()
+
+def _resolve(path):
+    """The container an override path patches and the key within it. Intermediate keys must exist; the last may be new."""
+    table, *keys = path.split('.')
+    if table not in OVERRIDABLE or not keys: raise ValueError(f"Can't override '{path}' (patchable tables: {', '.join(OVERRIDABLE)})")
+    container = OVERRIDABLE[table]
+    try:
+        for key in keys[:-1]: container = container[int(key) if isinstance(container, list) else key]
+        key = int(keys[-1]) if isinstance(container, list) else keys[-1]
+        if isinstance(container, list): container[key]
+    except (KeyError, IndexError, ValueError, TypeError) as e: raise ValueError(f"Can't override '{path}': no such entry ({type(e).__name__}: {e})") from None
+    if not isinstance(container, (dict, list)): raise ValueError(f"Can't override '{path}': its parent is not a table or list")
+    return container, key
+
+def validate_overrides(overrides):
+    for path in overrides: _resolve(path)
+
+def apply_overrides(overrides, undo=None):
+    """Patches the shared asset tables in place. Keys are dotted paths (list indices as integers). Each patch is logged
+    to `undo` as it is made, so a failure part-way can still be reverted; returns the undo log."""
+    undo = [] if undo is None else undo
+    try:
+        for path, value in overrides.items():
+            container, key = _resolve(path)
+            undo.append((container, key, container[key] if isinstance(container, list) or key in container else _MISSING)); container[key] = value
+    finally: compile_stats.cache_clear() # Tower stat blocks are compiled from DOG_TOWERS
+    return undo
+
+def revert_overrides(undo):
+    for container, key, old in reversed(undo):
+        if old is _MISSING: del container[key]
+        else: container[key] = old
+    compile_stats.cache_clear()
+
+def expand_grid(spec):
+    """Turns a sweep spec into a list of run descriptions, one per combination."""
+    maps = list(MAPS) if spec.get("maps", "all") == "all" else spec["maps"]
+    difficulties = list(DIFFICULTY_SETTINGS) if spec.get("difficulties", "all") == "all" else spec["difficulties"]
+    layouts = {name: load_layout(v) if isinstance(v, str) else v for name, v in spec.get("layouts", {"empty": []}).items()}
+    scripts, overrides = spec.get("upgrade_scripts", {"none": []}), spec.get("overrides", {"baseline": {}})
+    for name in maps:
+        if name not in MAPS: raise ValueError(f"Unknown map '{name}'")
+    for override_set in overrides.values(): validate_overrides(override_set) # Fail before any worker starts
+    runs = []
+    for map_id, difficulty, layout_name, script_name, override_name in itertools.product(maps, difficulties, layouts, scripts, overrides):
+        runs.append({"run_id": len(runs), "map_id": map_id, "difficulty": difficulty, "layout": layout_name, "upgrade_script": script_name, "overrides": override_name,
+                     "layout_data": layouts[layout_name], "script_data": scripts[script_name], "override_data": overrides[override_name], "rounds": spec.get("rounds")})
+    return runs
+
+def run_one(run):
+    """Worker: plays one combination with its overrides applied, then restores the tables for the next run in this process."""
+    undo, meta = [], {k: run[k] for k in ("run_id", "map_id", "difficulty", "layout", "upgrade_script", "overrides")}
+    try:
+        apply_overrides(run["override_data"], undo)
+        sim = Simulation(run["map_id"], run["difficulty"], run["layout_data"], upgrade_script=run["script_data"])
+        summary = sim.run(run["rounds"])
+    except Exception as e: error = f"{type(e).__name__}: {e}"; return run, [dict(meta, error=error)], {"error": error} # One row marks the failed run
+    finally: revert_overrides(undo) # Also undoes the patches made before a failing one
+    rows = [dict(meta, pops=pops, **{k: r[k] for k in ("round", "leaks", "lives", "money", "ticks", "wall_time", "timed_out")}) for r, pops in zip(sim.round_results, round_pops(sim.round_results))]
+    return run, rows, summary
+
+def round_pops(round_results):
+    """Pops each layout tower made in each round, keyed by its index in the layout; towers not placed yet are absent."""
+    previous = {}
+    for result in round_results:
+        yield {index: count - previous.get(index, 0) for index, count in result["layout_pops"].items()}; previous = result["layout_pops"]
+
+class ResultWriter:
+    """Streams round rows to .jsonl (one JSON object per line) or .csv (pops as 'index:count' joined with ';'), flushing after each run."""
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.csv = csv.DictWriter(self.file, fieldnames=CSV_FIELDS) if path.endswith('.csv') else None
+        if self.csv: self.csv.writeheader()
+    def write(self, rows):
+        for row in rows:
+            if self.csv: self.csv.writerow(dict(row, pops=";".join(f"{index}:{count}" for index, count in row.get("pops", {}).items())))
+            else: self.file.write(json.dumps(row) + "\n")
+        self.file.flush()
+    def close(self): self.file.close()
+
+def sweep(spec, out_path, workers=None, on_run=None):
+    """Runs the whole grid across `workers` processes (all cores by default). Returns the per-run summaries."""
+    runs, writer, summaries = expand_grid(spec), ResultWriter(out_path), []
+    try:
+        with multiprocessing.Pool(processes=workers or os.cpu_count()) as pool:
+            for done, (run, rows, summary) in enumerate(pool.imap_unordered(run_one, runs, chunksize=1), 1):
+                writer.write(rows); summaries.append(dict(summary, run_id=run["run_id"]))
+                if on_run: on_run(done, len(runs), run, summary)
+    finally: writer.close()
+    return summaries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel headless balance sweep")
+    parser.add_argument("spec", nargs="?", help='JSON sweep spec: {"maps", "difficulties", "layouts": {name: file or list}, "upgrade_scripts": {name: [{"tower", "path"}]}, "overrides": {name: {"DOG_TOWERS.x.cost": 500}}, "rounds"}')
+    parser.add_argument("--out", default="sweep_results.jsonl", help="Output file (.jsonl or .csv)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--maps", nargs="+", help="Override the spec's maps"); parser.add_argument("--difficulties", nargs="+", help="Override the spec's difficulties")
+    parser.add_argument("--layouts", nargs="+", help="Layout files (override the spec's layouts)"); parser.add_argument("--rounds", type=int, help="Rounds per run (default: all)")
+    args = parser.parse_args(argv)
+    spec = {}
+    if args.spec:
+        with open(args.spec, 'r') as f: spec = json.load(f)
+    if args.maps: spec["maps"] = args.maps
+    if args.difficulties: spec["difficulties"] = args.difficulties
+    if args.layouts: spec["layouts"] = {os.path.splitext(os.path.basename(p))[0]: p for p in args.layouts}
+    if args.rounds is not None: spec["rounds"] = args.rounds
+    start = time.perf_counter()
+    def report(done, total, run, summary):
+        outcome = summary.get("error") or f"{summary['rounds_played']} rounds, leaks {summary['total_leaks']}, {'WIN' if summary['win'] else 'LOSS' if summary['lose'] else 'IN PROGRESS'} ({summary['wall_time']:.1f}s)"
+        print(f"[{done}/{total}] {run['map_id']}/{run['difficulty']} layout={run['layout']} script={run['upgrade_script']} overrides={run['overrides']}: {outcome}", flush=True)
+    try: summaries = sweep(spec, args.out, args.workers, report)
+    except ValueError as e: print(f"Invalid sweep spec: {e}"); return 2
+    print(f"{len(summaries)} runs in {time.perf_counter() - start:.1f}s -> {args.out}")
+    return 1 if any("error" in s for s in summaries) else 0
+
+if __name__ == "__main__": sys.exit(main())
@@ -0,0 +1,40 @@
+# text_cache.py
+# Bounded LRU cache of rendered text surfaces and wrapped-line layouts, shared by Renderer.draw_text and Button.draw,
+# so HUD values, button labels and upgrade descriptions are only rasterized when they actually change.
+from collections import OrderedDict
+
+class TextCache:
+    """Surfaces are keyed by (text, font, color); wrapped layouts by (text, font, width). Returned surfaces are shared: blit them, never draw on them."""
+    def __init__(self, max_surfaces=512, max_layouts=128):
+        self.max_surfaces, self.max_layouts = max_surfaces, max_layouts
+        self._surfaces, self._layouts = OrderedDict(), OrderedDict()
+        self.hits = self.misses = self.layout_hits = self.layout_misses = 0
+
+    def render(self, font, text, color):
+        key = (text, font, tuple(color)); surface = self._surfaces.get(key)
+        if surface is not None: self.hits += 1; self._surfaces.move_to_end(key); return surface
+        self.misses += 1; surface = self._surfaces[key] = font.render(text, True, color)
+        if len(self._surfaces) > self.max_surfaces: self._surfaces.popitem(last=False)
+        return surface
+
+    def wrap(self, font, text, width):
+        """Greedy word wrap: a line grows while its rendered width stays under `width`. Returns a tuple of lines."""
+        key = (text, font, width); lines = self._layouts.get(key)
+        if lines is not None: self.layout_hits += 1; self._layouts.move_to_end(key); return lines
+        self.layout_misses += 1; lines, current_line = [], ""
+        for word in text.split(' '):
+            if font.size(current_line + word)[0] < width: current_line += word + " "
+            else: lines.append(current_line); current_line = word + " "
+        lines.append(current_line); lines = self._layouts[key] = tuple(lines)
+        if len(self._layouts) > self.max_layouts: self._layouts.popitem(last=False)
+        return lines
+
+    def stats(self):
+        return {"surfaces": len(self._surfaces), "hits": self.hits, "misses": self.misses,
+                "layouts": len(self._layouts), "layout_hits": self.layout_hits, "layout_misses": self.layout_misses}
+
+    def reset_stats(self): self.hits = self.misses = self.layout_hits = self.layout_misses = 0
+
+    def clear(self): self._surfaces.clear(); self._layouts.clear()
+
+text_cache = TextCache()
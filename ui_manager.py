@@ -1,9 +1,14 @@
 # ui_manager.py
 import pygame
-import os
+from functools import lru_cache
 from assets import MAPS, DOG_TOWERS
-from utilities import COLOR_PALETTES, SCREEN_HEIGHT, SCREEN_WIDTH
-from game_engine import SAVE_FILE
+from utilities import COLOR_PALETTES, SCREEN_HEIGHT, SCREEN_WIDTH, GAME_SPEEDS
+from game_objects import is_upgrade_path_locked
+from text_cache import text_cache
+from profiler import profiler
+
+@lru_cache(maxsize=None)
+def _description_font(): return pygame.font.SysFont("Arial", 10) # One shared font, so cached description text is reused across buttons
 
 # --- BUG FIX: Moved Slider class definition to the top of the file ---
 class Slider:
@@ -32,7 +37,7 @@ class Button:
         self.is_hovered, self.is_clicked, self.is_active, self.is_selected = False, False, True, False
         self.colors = {"normal":COLOR_PALETTES['default']['button_bg'], "hover":COLOR_PALETTES['default']['button_hover'], "clicked":COLOR_PALETTES['default']['button_click'], "disabled":COLOR_PALETTES['default']['button_disabled'], "selected":COLOR_PALETTES['default']['success']}
         self.text_color = COLOR_PALETTES['default']['button_text']
-        self.description, self.desc_font = "", pygame.font.SysFont("Arial", 10)
+        self.description, self.desc_font = "", _description_font()
     def handle_event(self, event, sound_manager):
         if not self.is_active: self.is_hovered=self.is_clicked=False; return False
         if event.type == pygame.MOUSEMOTION: self.is_hovered = self.rect.collidepoint(event.pos)
@@ -47,94 +52,121 @@ class Button:
         color = self.colors['disabled'] if not self.is_active else self.colors['selected'] if self.is_selected else self.colors['clicked'] if self.is_clicked else self.colors['hover'] if self.is_hovered else self.colors['normal']
         pygame.draw.rect(screen, color, self.rect, border_radius=5)
         if self.id.startswith("upgrade_"):
-            screen.blit(self.font.render(self.text, True, self.text_color), (self.rect.x + 5, self.rect.y + 5))
-            words, lines, current_line = self.description.split(' '), [], ""
-            for word in words:
-                if self.desc_font.size(current_line + word)[0] < self.rect.width-10: current_line += word + " "
-                else: lines.append(current_line); current_line = word + " "
-            lines.append(current_line)
-            for i, line in enumerate(lines): screen.blit(self.desc_font.render(line, True, self.text_color), (self.rect.x + 5, self.rect.y + 22 + i*12))
-        elif self.text: screen.blit(self.font.render(self.text, True, self.text_color), self.font.render(self.text, True, self.text_color).get_rect(center=self.rect.center))
+            screen.blit(text_cache.render(self.font, self.text, self.text_color), (self.rect.x + 5, self.rect.y + 5))
+            for i, line in enumerate(text_cache.wrap(self.desc_font, self.description, self.rect.width-10)): screen.blit(text_cache.render(self.desc_font, line, self.text_color), (self.rect.x + 5, self.rect.y + 22 + i*12))
+        elif self.text: text_surface = text_cache.render(self.font, self.text, self.text_color); screen.blit(text_surface, text_surface.get_rect(center=self.rect.center))
+
+class ButtonHitGrid:
+    """Buttons bucketed by the grid cells their rects overlap, so a mouse event only reaches the buttons under it."""
+    def __init__(self, cell_size=64): self.cell_size, self.cells = cell_size, {}
+    def rebuild(self, buttons):
+        cells, size = {}, self.cell_size
+        for order, button in enumerate(buttons):
+            rect = button.rect
+            for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+                for cy in range(rect.top // size, (rect.bottom - 1) // size + 1): cells.setdefault((cx, cy), []).append((order, button))
+        self.cells = cells
+    def at(self, pos):
+        """(order, button) for the buttons whose rect contains pos, in creation order."""
+        return [entry for entry in self.cells.get((pos[0] // self.cell_size, pos[1] // self.cell_size), ()) if entry[1].rect.collidepoint(pos)]
 
 class UIManager:
     def __init__(self, game):
         self.game, self.buttons, self.sliders, self.sound_manager = game, [], [], game.sound_manager
         self.selected_tower, self.placing_tower_type, self.mouse_pos, self.scroll_y = None, None, (0,0), 0
+        self.button_index, self.hit_grid, self.tracked, self.layout_version = {}, ButtonHitGrid(), [], 0 # tracked: buttons left hovered or pressed
         self.create_buttons_for_state()
+    def button(self, button_id): return self.button_index.get(button_id)
+    def _add_button(self, button): self.buttons.append(button); self.button_index[button.id] = button; return button
     def create_buttons_for_state(self):
-        self.buttons.clear(); self.sliders.clear()
+        self.buttons.clear(); self.sliders.clear(); self.button_index.clear(); self.tracked = []
+        self.panel_key, self.panel_money, self.upgrade_costs, self.applied_scroll = object(), None, [None] * 3, None # Forces a full panel refresh
+        self.layout_version += 1
         state = self.game.game_state
         if state == 'main_menu': self._create_main_menu_buttons()
         elif state == 'in_game': self._create_ingame_buttons()
         elif state == 'paused': self._create_pause_menu_buttons()
         elif state == 'settings': self._create_settings_menu_buttons()
+        self.buy_rows = [(b, i) for i, b in enumerate(b for b in self.buttons if b.id.startswith("buy_"))] # Row in the scrolling shop column
+        self.hit_grid.rebuild(self.buttons)
     def _create_main_menu_buttons(self):
         font,start_font=self.game.renderer.get_font(24),self.game.renderer.get_font(32,True)
-        for i,map_id in enumerate(MAPS.keys()): self.buttons.append(Button(100+(i%5)*220,250+(i//5)*120,200,100,"",font,self.handle_click,f"map_{map_id}"))
+        for i,map_id in enumerate(MAPS.keys()): self._add_button(Button(100+(i%5)*220,250+(i//5)*120,200,100,"",font,self.handle_click,f"map_{map_id}"))
         for i,diff in enumerate(['easy','medium','hard']):
-            btn = Button(320+i*220,520,200,50,diff.capitalize(),font,self.handle_click,f"diff_{diff}")
+            btn = self._add_button(Button(320+i*220,520,200,50,diff.capitalize(),font,self.handle_click,f"diff_{diff}"))
             if diff == self.game.selected_difficulty: btn.is_selected = True
-            self.buttons.append(btn)
-        self.buttons.append(Button(310,600,200,50,"New Game",start_font,self.handle_click,"start_game"))
-        if os.path.exists(SAVE_FILE): self.buttons.append(Button(770,600,200,50,"Continue",start_font,self.handle_click,"continue_game"))
-        self.buttons.append(Button(SCREEN_WIDTH-120,SCREEN_HEIGHT-60,100,40,"Settings",self.game.renderer.get_font(16),self.handle_click,"settings"))
+        self._add_button(Button(310,600,200,50,"New Game",start_font,self.handle_click,"start_game"))
+        if self.game.game_engine.has_save(): self._add_button(Button(770,600,200,50,"Continue",start_font,self.handle_click,"continue_game"))
+        self._add_button(Button(SCREEN_WIDTH-120,SCREEN_HEIGHT-60,100,40,"Settings",self.game.renderer.get_font(16),self.handle_click,"settings"))
     def _create_ingame_buttons(self):
         font,play_font=self.game.renderer.get_font(12),self.game.renderer.get_font(20,True)
-        for i,(tower_id,data) in enumerate(DOG_TOWERS.items()): self.buttons.append(Button(1160,70+i*100,100,90,"",font,self.handle_click,f"buy_{tower_id}"))
-        self.buttons.append(Button(1080,650,70,50,"||",play_font,self.handle_click,"play_pause"))
-        self.buttons.append(Button(1000,650,70,50,"▶▶",play_font,self.handle_click,"fast_forward"))
-        self.buttons.append(Button(920,650,70,50,"AUTO",self.game.renderer.get_font(14,True),self.handle_click,"toggle_autostart"))
-        self.buttons.append(Button(840,650,70,50,"",play_font,self.handle_click,"cancel_placement"))
+        for i,(tower_id,data) in enumerate(DOG_TOWERS.items()): self._add_button(Button(1160,70+i*100,100,90,"",font,self.handle_click,f"buy_{tower_id}"))
+        self._add_button(Button(1080,650,70,50,"||",play_font,self.handle_click,"play_pause"))
+        self._add_button(Button(1000,650,70,50,"▶▶",play_font,self.handle_click,"fast_forward")).is_selected=self.game.game_speed!=1.0
+        self._add_button(Button(920,650,70,50,"AUTO",self.game.renderer.get_font(14,True),self.handle_click,"toggle_autostart"))
+        self._add_button(Button(840,650,70,50,"",play_font,self.handle_click,"cancel_placement"))
         upgrade_font=self.game.renderer.get_font(12,True)
-        for i in range(3): self.buttons.append(Button(220,480+i*80,250,70,"",upgrade_font,self.handle_click,f"upgrade_{i}"))
-        self.buttons.append(Button(10,640,200,30,"Target: First",self.game.renderer.get_font(14,True),self.handle_click,"cycle_targeting"))
-        self.buttons.append(Button(10,680,200,30,"Sell for $0",self.game.renderer.get_font(16,True),self.handle_click,"sell_tower"))
+        for i in range(3): self._add_button(Button(220,480+i*80,250,70,"",upgrade_font,self.handle_click,f"upgrade_{i}"))
+        self._add_button(Button(10,640,200,30,"Target: First",self.game.renderer.get_font(14,True),self.handle_click,"cycle_targeting"))
+        self._add_button(Button(10,680,200,30,"Sell for $0",self.game.renderer.get_font(16,True),self.handle_click,"sell_tower"))
     def _create_pause_menu_buttons(self):
         font=self.game.renderer.get_font(32,True)
-        self.buttons.append(Button(SCREEN_WIDTH//2-100,250,200,50,"Resume",font,self.handle_click,"resume"))
-        self.buttons.append(Button(SCREEN_WIDTH//2-100,320,200,50,"Restart",font,self.handle_click,"restart"))
-        self.buttons.append(Button(SCREEN_WIDTH//2-100,390,200,50,"Settings",font,self.handle_click,"settings"))
-        self.buttons.append(Button(SCREEN_WIDTH//2-100,460,200,50,"Main Menu",font,self.handle_click,"menu"))
+        self._add_button(Button(SCREEN_WIDTH//2-100,250,200,50,"Resume",font,self.handle_click,"resume"))
+        self._add_button(Button(SCREEN_WIDTH//2-100,320,200,50,"Restart",font,self.handle_click,"restart"))
+        self._add_button(Button(SCREEN_WIDTH//2-100,390,200,50,"Settings",font,self.handle_click,"settings"))
+        self._add_button(Button(SCREEN_WIDTH//2-100,460,200,50,"Main Menu",font,self.handle_click,"menu"))
     def _create_settings_menu_buttons(self):
         self.sliders.append(Slider(SCREEN_WIDTH//2-150,300,300,20,self.sound_manager.set_music_volume,lambda:self.sound_manager.music_volume,"music_volume","Music Volume"))
         self.sliders.append(Slider(SCREEN_WIDTH//2-150,400,300,20,self.sound_manager.set_sfx_volume,lambda:self.sound_manager.sfx_volume,"sfx_volume","Sound FX Volume"))
-        self.buttons.append(Button(SCREEN_WIDTH//2-100,500,200,50,"Back",self.game.renderer.get_font(32,True),self.handle_click,"back_from_settings"))
+        self._add_button(Button(SCREEN_WIDTH//2-100,500,200,50,"Back",self.game.renderer.get_font(32,True),self.handle_click,"back_from_settings"))
     def update(self, game_engine):
         state=self.game.game_state
         if state=='main_menu':
-            start_button=next((b for b in self.buttons if b.id=="start_game"),None)
+            start_button=self.button("start_game")
             if start_button:start_button.is_active=self.game.selected_map is not None
         elif state=='in_game':
-            play_pause_button=next((b for b in self.buttons if b.id=="play_pause"),None)
+            play_pause_button=self.button("play_pause")
             if play_pause_button:
                 play_pause_button.text = "▶" if not game_engine.is_round_active else "||"
                 play_pause_button.is_active = True
-            cancel_button=next((b for b in self.buttons if b.id=="cancel_placement"),None)
+            cancel_button=self.button("cancel_placement")
             if cancel_button:cancel_button.is_active=self.placing_tower_type is not None
-            self.update_tower_panel()
+            with profiler.section("ui.tower_panel"): self.update_tower_panel()
             buy_area=pygame.Rect(1150,50,130,SCREEN_HEIGHT-120);
             if buy_area.collidepoint(self.mouse_pos):
                 content_height=len(DOG_TOWERS)*100; visible_height=buy_area.height; max_scroll=max(0,content_height-visible_height+10)
                 self.scroll_y=max(-max_scroll,min(0,self.scroll_y))
-            for btn in self.buttons:
-                if btn.id.startswith("buy_"):btn.rect.y=70+list(DOG_TOWERS.keys()).index(btn.id.split('_',1)[1])*100+self.scroll_y
+            if self.scroll_y!=self.applied_scroll: # Shop buttons only move when the column scrolls
+                for btn,row in self.buy_rows:btn.rect.y=70+row*100+self.scroll_y
+                self.applied_scroll=self.scroll_y; self.hit_grid.rebuild(self.buttons)
     def handle_events(self, events):
         self.mouse_pos=pygame.mouse.get_pos(); clicked_on_ui=False
         for event in events:
             if event.type==pygame.MOUSEWHEEL and self.game.game_state=='in_game':self.scroll_y+=event.y*20
+            if event.type==pygame.KEYDOWN and event.key==pygame.K_F3:profiler.toggle()
+            elif event.type==pygame.KEYDOWN and event.key==pygame.K_F4 and profiler.enabled:self.game.export_profile()
             for slider in self.sliders:
                 if slider.handle_event(event):clicked_on_ui=True
-            for button in self.buttons:
-                if button.handle_event(event,self.sound_manager):clicked_on_ui=True
+            if event.type in (pygame.MOUSEMOTION,pygame.MOUSEBUTTONDOWN,pygame.MOUSEBUTTONUP):
+                if self._dispatch_to_buttons(event):clicked_on_ui=True
             if event.type==pygame.MOUSEBUTTONUP and not clicked_on_ui:
                 if event.button==1:self.handle_world_click()
                 elif event.button==3:self.handle_right_click()
+    def _dispatch_to_buttons(self, event):
+        # Only the buttons under the pointer, plus any left hovered or pressed by earlier events, can change state
+        entries,version,clicked={id(b):(order,b) for order,b in self.tracked+self.hit_grid.at(event.pos)},self.layout_version,False
+        for order,button in sorted(entries.values(),key=lambda e:e[0]):
+            if button.handle_event(event,self.sound_manager):clicked=True
+            if self.layout_version!=version:return clicked # The click switched screens: these buttons are gone
+        self.tracked=[(order,b) for order,b in entries.values() if b.is_hovered or b.is_clicked]
+        return clicked
     def handle_click(self, button_id):
         if button_id.startswith("map_"):self.game.selected_map=button_id.split('_',1)[1]; [setattr(b,'is_selected',(b.id==button_id)) for b in self.buttons if b.id.startswith("map_")]
         elif button_id.startswith("diff_"):self.game.selected_difficulty=button_id.split('_',1)[1]; [setattr(b,'is_selected',(b.id==button_id)) for b in self.buttons if b.id.startswith("diff_")]
         elif button_id=="start_game":
             if self.game.selected_map:self.game.game_engine.delete_save();self.game.start_game(self.game.selected_map,self.game.selected_difficulty)
         elif button_id=="continue_game":
+            self.game.save_recording() # Finish the previous game's log; resumed games are not recorded
             if self.game.game_engine.load_game():self.game.change_state('in_game')
         elif button_id.startswith("buy_"):self.placing_tower_type,self.selected_tower=button_id.split('_',1)[1],None
         elif button_id=="play_pause":
@@ -145,16 +177,17 @@ class UIManager:
             if self.selected_tower:path_index=int(button_id.split('_',1)[1]);self.game.game_engine.upgrade_tower(self.selected_tower,path_index)
         elif button_id=="menu":self.game.game_engine.save_game();self.game.change_state('main_menu');self.selected_tower,self.placing_tower_type,self.game.selected_map=None,None,None
         elif button_id=="cycle_targeting":
-            if self.selected_tower:self.selected_tower.cycle_targeting_priority()
+            if self.selected_tower:self.game.game_engine.cycle_targeting(self.selected_tower)
         elif button_id=="sell_tower":
             if self.selected_tower:self.game.game_engine.sell_tower(self.selected_tower);self.selected_tower=None
         elif button_id=="fast_forward":
-            ff_button=next((b for b in self.buttons if b.id=="fast_forward"),None)
-            if self.game.game_speed==1.0:self.game.game_speed,ff_button.is_selected=2.0,True
-            else:self.game.game_speed,ff_button.is_selected=1.0,False
+            ff_button=self.button("fast_forward") # Cycles 1x -> 2x -> ... -> 10x -> as fast as possible -> 1x
+            self.game.game_speed=GAME_SPEEDS[(GAME_SPEEDS.index(self.game.game_speed)+1)%len(GAME_SPEEDS)]
+            ff_button.is_selected=self.game.game_speed!=1.0
+            if self.game.game_engine.recorder:self.game.game_engine.recorder.action(self.game.game_engine,"set_game_speed",self.game.game_speed)
         elif button_id=="toggle_autostart":
-            self.game.game_engine.auto_start_next_round=not self.game.game_engine.auto_start_next_round
-            btn=next((b for b in self.buttons if b.id==button_id),None);btn.is_selected=self.game.game_engine.auto_start_next_round
+            self.game.game_engine.set_auto_start(not self.game.game_engine.auto_start_next_round)
+            btn=self.button(button_id);btn.is_selected=self.game.game_engine.auto_start_next_round
         elif button_id=="cancel_placement":self.placing_tower_type=None
         elif button_id=="resume":self.game.change_state('in_game')
         elif button_id=="restart":self.game.game_engine.delete_save();self.game.start_game(self.game.selected_map,self.game.selected_difficulty)
@@ -170,27 +203,35 @@ class UIManager:
         if self.placing_tower_type:self.placing_tower_type=None
         elif self.selected_tower:self.selected_tower=None
     def update_tower_panel(self):
-        money,targeting_button,sell_button=self.game.game_engine.money,next((b for b in self.buttons if b.id=="cycle_targeting"),None),next((b for b in self.buttons if b.id=="sell_tower"),None)
-        if self.selected_tower:
-            if targeting_button:targeting_button.is_active=True;targeting_button.text=f"Target: {self.selected_tower.targeting_priority.capitalize()}"
-            if sell_button:sell_button.is_active=True;sell_button.text=f"Sell for ${self.selected_tower.get_sell_value()}"
-            tower_data,upgrades=DOG_TOWERS[self.selected_tower.tower_id],self.selected_tower.upgrades
+        # Texts, descriptions and locks only change with the selection, its upgrades or its targeting; affordability only with money
+        tower=self.selected_tower; money=self.game.game_engine.money
+        key=(tower,tuple(tower.upgrades),tower.targeting_priority) if tower else None
+        if key!=self.panel_key:self._refresh_tower_panel(tower);self.panel_key,self.panel_money=key,None
+        if tower and money!=self.panel_money:
+            for i,cost in enumerate(self.upgrade_costs):
+                btn=self.button(f"upgrade_{i}")
+                if btn and cost is not None:btn.is_active=money>=cost
+            self.panel_money=money
+    def _refresh_tower_panel(self, tower):
+        targeting_button,sell_button=self.button("cycle_targeting"),self.button("sell_tower"); self.upgrade_costs=[None]*3
+        if tower:
+            if targeting_button:targeting_button.is_active=True;targeting_button.text=f"Target: {tower.targeting_priority.capitalize()}"
+            if sell_button:sell_button.is_active=True;sell_button.text=f"Sell for ${tower.get_sell_value()}"
+            tower_data,upgrades=DOG_TOWERS[tower.tower_id],tower.upgrades
             for i in range(3):
-                btn=next((b for b in self.buttons if b.id==f"upgrade_{i}"),None);
+                btn=self.button(f"upgrade_{i}")
                 if not btn:continue
                 current_tier=upgrades[i]
-                path_is_locked = (upgrades[i] >= 2 and any(p > 2 for j, p in enumerate(upgrades) if j != i)) or \
-                               (any(p > 2 for p in upgrades) and upgrades[i] < 2) or \
-                               (upgrades[i] >= 2 and upgrades.count(2) > 0 and (upgrades.index(2) if 2 in upgrades else -1) != i)
+                path_is_locked = is_upgrade_path_locked(upgrades, i)
                 if current_tier>=5:btn.text,btn.description,btn.is_active="MAXED","",False
                 elif path_is_locked:btn.text,btn.description,btn.is_active="LOCKED","",False
                 else:
                     upgrade_info=tower_data['upgrades'][f'path{i+1}'][current_tier]
                     btn.text,btn.description=f"{upgrade_info['name']} (${upgrade_info['cost']})",upgrade_info['description']
-                    btn.is_active=money>=upgrade_info['cost']
+                    self.upgrade_costs[i]=upgrade_info['cost'] # is_active is set from money by update_tower_panel
         else:
             if targeting_button:targeting_button.is_active=False
             if sell_button:sell_button.is_active=False
             for i in range(3):
-                btn=next((b for b in self.buttons if b.id==f"upgrade_{i}"),None)
+                btn=self.button(f"upgrade_{i}")
                 if btn:btn.is_active=False
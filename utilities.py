@@ -6,6 +6,14 @@ SCREEN_HEIGHT = 720
 PLAYABLE_WIDTH = 1150 # NEW: The width of the map/game area
 GAME_TITLE = "Geometric Canine Defense"
 SETTINGS_FILE = "settings.json" # NEW
+MAP_CACHE_DIR = "map_cache" # Prerendered static map layers (safe to delete; rebuilt on demand)
+SPRITE_ATLAS_DIR = "sprite_cache" # Prebaked tower/enemy/icon sprite atlas (safe to delete; rebuilt in the background)
+PROFILE_TRACE_FILE = "frame_trace_%Y%m%d_%H%M%S.json" # F4 with the F3 profiler on; a strftime pattern
+STARTUP_BUDGET_MS = 500 # Time to first frame that --startup-profile checks against
+SIM_DT = 1.0 / 60.0 # Every simulation tick, live or headless, advances the engine by exactly this much
+GAME_SPEEDS = (1.0, 2.0, 3.0, 5.0, 10.0, None) # Fast-forward cycle; None runs as many ticks as fit in MAX_SPEED_FRAME_BUDGET
+MAX_TICKS_PER_FRAME = 40 # Catch-up cap: simulated time beyond this many ticks in one frame is dropped, not queued
+MAX_SPEED_FRAME_BUDGET = 0.012 # Seconds of ticking per rendered frame in "as fast as possible" mode
 COLOR_PALETTES = {
     'default': {
         'background': (44, 62, 80), 'primary_text': (236, 240, 241),
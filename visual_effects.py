@@ -0,0 +1,54 @@
+# visual_effects.py
+# Transient, purely cosmetic effects (hitscan trails, explosions) as parallel columns instead of one object per effect,
+# and the renderer side: every live effect is drawn onto one preallocated alpha overlay that is cleared and blitted
+# back as a single dirty rectangle, so no surfaces are allocated per effect or per frame.
+import pygame
+
+LINE_TRAIL, EXPLOSION = 0, 1
+
+class EffectBuffer:
+    """One entry per live effect: kind, start point (the centre, for explosions), end point, radius, time left and
+    total lifetime, each in its own list. Expired entries are compacted away in advance()."""
+    def __init__(self): self.clear()
+
+    def clear(self): self.kind, self.x0, self.y0, self.x1, self.y1, self.radius, self.life, self.duration = [], [], [], [], [], [], [], []
+
+    def __len__(self): return len(self.kind)
+
+    def _add(self, kind, x0, y0, x1, y1, radius, lifetime):
+        self.kind.append(kind); self.x0.append(x0); self.y0.append(y0); self.x1.append(x1); self.y1.append(y1)
+        self.radius.append(radius); self.life.append(lifetime); self.duration.append(lifetime)
+
+    def add_line(self, start, end, lifetime=0.1): self._add(LINE_TRAIL, start[0], start[1], end[0], end[1], 0, lifetime)
+
+    def add_explosion(self, pos, radius, lifetime=0.2): self._add(EXPLOSION, pos[0], pos[1], pos[0], pos[1], radius, lifetime)
+
+    def advance(self, dt):
+        if not self.life: return
+        life = self.life = [t - dt for t in self.life]
+        if min(life) > 0: return
+        keep = [i for i, t in enumerate(life) if t > 0]
+        for name in ("kind", "x0", "y0", "x1", "y1", "radius", "life", "duration"):
+            column = getattr(self, name); setattr(self, name, [column[i] for i in keep])
+
+class EffectRenderer:
+    """Draws an EffectBuffer: trails fade out, explosions fade while their ring expands to the blast radius."""
+    def __init__(self, size):
+        self.overlay = pygame.Surface(size, pygame.SRCALPHA)
+        if pygame.display.get_surface(): self.overlay = self.overlay.convert_alpha()
+        self.overlay.fill((0, 0, 0, 0)); self.dirty = None # Area of the overlay drawn on last frame
+
+    def draw(self, screen, effects):
+        overlay, line, circle = self.overlay, pygame.draw.line, pygame.draw.circle
+        if self.dirty: overlay.fill((0, 0, 0, 0), self.dirty)
+        if not len(effects): self.dirty = None; return
+        rects = []
+        for kind, x0, y0, x1, y1, radius, life, duration in zip(effects.kind, effects.x0, effects.y0, effects.x1, effects.y1, effects.radius, effects.life, effects.duration):
+            fade = max(0.0, min(1.0, life / duration))
+            if kind == LINE_TRAIL: rects.append(line(overlay, (255, 255, 255, int(255 * fade)), (x0, y0), (x1, y1), 3))
+            elif radius > 0:
+                r = max(1, int(radius * (1.0 - 0.4 * fade))) # Starts at 60% of the blast radius and grows into it
+                rects.append(circle(overlay, (255, 160, 50, int(110 * fade)), (x0, y0), r))
+                circle(overlay, (255, 230, 150, int(220 * fade)), (x0, y0), r, 2)
+        self.dirty = rects[0].unionall(rects[1:]).clip(overlay.get_rect()) if rects else None
+        if self.dirty: screen.blit(overlay, self.dirty.topleft, self.dirty)